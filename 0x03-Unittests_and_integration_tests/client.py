@@ -1,33 +1,185 @@
-import requests
+import asyncio
+import operator
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlencode, urlparse
+
+# Requests go through the shared keep-alive sessions in utils
+from utils import (get_json, get_json_async, get_json_page,
+                   get_json_page_async, memoize_method)
+
+GITHUB_API = "https://api.github.com"
+
+# Seconds an org's metadata is reused before it is fetched again
+ORG_TTL = 300
+
+
+def _page_number(url):
+    """The ?page= number of a paginated URL, or None."""
+    pages = parse_qs(urlparse(url).query).get("page")
+    return int(pages[0]) if pages and pages[0].isdigit() else None
+
+
+def _with_page(url, page):
+    parts = urlparse(url)
+    query = parse_qs(parts.query)
+    query["page"] = [str(page)]
+    return parts._replace(query=urlencode(query, doseq=True)).geturl()
+
+
+def _remaining_pages(links):
+    """URLs of every page after the first, when the Link header has them.
+
+    Returns None if only a "next" link is given, so the total is unknown.
+    """
+    if "next" not in links:
+        return []
+    if "last" not in links:
+        return None
+    first = _page_number(links["next"]["url"])
+    last = _page_number(links["last"]["url"])
+    if first is None or last is None:
+        return None
+    return [_with_page(links["last"]["url"], page)
+            for page in range(first, last + 1)]
 
-def get_json(url):
-    response = requests.get(url)
-    response.raise_for_status()
-    return response.json()
 
 class GithubOrgClient:
-    def __init__(self, org_name):
+    def __init__(self, org_name, max_workers=8):
         self.org_name = org_name
+        # Upper bound on pages fetched at the same time
+        self.max_workers = max_workers
 
+    # Shared by every client of the same org, not kept per instance
+    @memoize_method(ttl=ORG_TTL, scope="class",
+                    key=operator.attrgetter("org_name"))
     def org(self):
         """This is a method that returns the organization data."""
-        return get_json(f"https://api.github.com/orgs/{self.org_name}")
+        return get_json(f"{GITHUB_API}/orgs/{self.org_name}")
 
     @property
     def _public_repos_url(self):
         """Returns the 'repos_url' from the org data"""
         return self.org().get("repos_url")
 
+    def repos_payload(self):
+        """Yield every repo of the org, one page at a time, in page order.
+
+        Once the first page's Link header gives the last page, the remaining
+        pages are fetched concurrently on up to max_workers threads.
+        """
+        payload, links = get_json_page(self._public_repos_url)
+        yield from payload
+
+        pages = _remaining_pages(links)
+        if pages is None:
+            # No page count to fan out over; follow "next" one page at a time
+            while "next" in links:
+                payload, links = get_json_page(links["next"]["url"])
+                yield from payload
+            return
+        if not pages:
+            return
+
+        workers = min(self.max_workers, len(pages))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(get_json_page, url) for url in pages]
+            try:
+                for future in futures:
+                    payload, _ = future.result()
+                    yield from payload
+            finally:
+                # Stop fetching if the caller stops iterating early
+                for future in futures:
+                    future.cancel()
+
+    def iter_public_repos(self, license_key=None):
+        """Yield repository names as their pages arrive."""
+        for repo in self.repos_payload():
+            if license_key is None or self.has_license(repo, license_key):
+                yield repo["name"]
+
     def public_repos(self, license_key=None):
         """Returns list of public repository names, optionally filtered by license."""
-        repos = get_json(self._public_repos_url)
-        if license_key is None:
-            return [repo["name"] for repo in repos]
+        return list(self.iter_public_repos(license_key))
+
+    def has_license(self, repo, license_key):
+        """Check if repo has the given license key."""
+        return (repo.get("license") or {}).get("key") == license_key
+
+
+class AsyncGithubOrgClient:
+    """asyncio counterpart of GithubOrgClient.
+
+    Requests share the running loop's aiohttp session, so the connection
+    limit set with utils.configure_session(pool_maxsize=...) bounds how
+    many requests all clients have in flight together.
+    """
+
+    def __init__(self, org_name, base_url=GITHUB_API):
+        self.org_name = org_name
+        self.base_url = base_url
+        # (task, expiry) of the org fetch, shared by concurrent callers
+        self._org = None
+
+    async def org(self):
+        """Returns the organization data, fetched once per ORG_TTL."""
+        if self._org is None or time.monotonic() >= self._org[1]:
+            url = f"{self.base_url}/orgs/{self.org_name}"
+            self._org = (asyncio.ensure_future(get_json_async(url)),
+                         time.monotonic() + ORG_TTL)
+        task = self._org[0]
+        try:
+            # Shielded so one cancelled caller does not cancel the others
+            return await asyncio.shield(task)
+        except Exception:
+            if self._org is not None and self._org[0] is task:
+                self._org = None
+            raise
+
+    @property
+    def _public_repos_url(self):
+        """Awaitable 'repos_url' from the org data"""
+        return self._repos_url()
+
+    async def _repos_url(self):
+        return (await self.org()).get("repos_url")
+
+    async def repos_payload(self):
+        """Every repo of the org, with the remaining pages fetched together."""
+        repos, links = await get_json_page_async(await self._public_repos_url)
+        pages = _remaining_pages(links)
+        if pages is None:
+            while "next" in links:
+                payload, links = await get_json_page_async(
+                    links["next"]["url"]
+                )
+                repos.extend(payload)
+            return repos
+        results = await asyncio.gather(
+            *(get_json_page_async(url) for url in pages)
+        )
+        for payload, _ in results:
+            repos.extend(payload)
+        return repos
+
+    async def public_repos(self, license_key=None):
+        """Returns list of public repository names, optionally filtered."""
         return [
-            repo["name"] for repo in repos
-            if self.has_license(repo, license_key)
+            repo["name"] for repo in await self.repos_payload()
+            if license_key is None or self.has_license(repo, license_key)
         ]
 
     def has_license(self, repo, license_key):
         """Check if repo has the given license key."""
-        return repo.get("license", {}).get("key") == license_key
+        return (repo.get("license") or {}).get("key") == license_key
+
+
+async def public_repos_by_org(org_names, license_key=None,
+                              base_url=GITHUB_API):
+    """Scan many orgs concurrently: {org name: repository names}."""
+    clients = [AsyncGithubOrgClient(name, base_url) for name in org_names]
+    results = await asyncio.gather(
+        *(client.public_repos(license_key) for client in clients)
+    )
+    return dict(zip(org_names, results))
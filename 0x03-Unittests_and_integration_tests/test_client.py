@@ -1,11 +1,19 @@
 #!/usr/bin/env python3
 """Unit tests for the GithubOrgClient class."""
 
+import asyncio
+import json
+import threading
 import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from unittest import TestCase
 from unittest.mock import patch, PropertyMock
+from urllib.parse import parse_qs, urlparse
 from parameterized import parameterized, parameterized_class
-from client import GithubOrgClient
+import fixtures
+import utils
+from client import (AsyncGithubOrgClient, GithubOrgClient,
+                    public_repos_by_org)
 
 # Test data representing a GitHub organization's API response
 org_payload = {
@@ -31,6 +39,10 @@ apache2_repos = ["repo1", "repo3"]
 class TestGithubOrgClient(TestCase):
     """Unit tests for the GithubOrgClient class."""
 
+    def setUp(self):
+        """Forget orgs fetched by earlier tests; the cache is shared."""
+        GithubOrgClient.org.cache_clear()
+
     @parameterized.expand([
         # Test cases: (test_name, org_name, expected_api_response)
         ("case_google", "google", {"login": "google", "id": 1}),
@@ -51,15 +63,31 @@ class TestGithubOrgClient(TestCase):
             f"https://api.github.com/orgs/{org_name}"
         )
 
-    @patch("client.get_json")  # Mock get_json to control API response
+    @patch("client.get_json", return_value={"login": "google"})
+    def test_org_memoized(self, mock_get_json):
+        """Test the org is fetched once per org name until invalidated."""
+        client = GithubOrgClient("google")
+        client.org()
+        GithubOrgClient("google").org()
+        mock_get_json.assert_called_once()
+
+        GithubOrgClient("abc").org()
+        self.assertEqual(mock_get_json.call_count, 2)
+        mock_get_json.reset_mock()
+
+        client.org.invalidate()
+        client.org()
+        mock_get_json.assert_called_once()
+
+    @patch("client.get_json_page")  # Mock get_json_page to control response
     def test_public_repos(self, mock_get_json):
         """Test GithubOrgClient.public_repos returns expected repo names."""
-        # Mock the API response containing repository data
-        mock_get_json.return_value = [
+        # Mock a single page of repository data without Link pagination
+        mock_get_json.return_value = ([
             {"name": "repo1"},
             {"name": "repo2"},
             {"name": "repo3"}
-        ]
+        ], {})
 
         # Mock _public_repos_url property to avoid dependency on org() method
         with patch.object(
@@ -83,6 +111,46 @@ class TestGithubOrgClient(TestCase):
             # Verify the _public_repos_url property was accessed
             mock_url.assert_called_once()
 
+    @patch("client.get_json_page")
+    def test_public_repos_paginated(self, mock_get_json_page):
+        """Test every page named by the Link header is fetched, in order."""
+        base = "https://api.github.com/orgs/testorg/repos"
+        pages = {
+            base: ([{"name": "repo1"}], {
+                "next": {"url": base + "?page=2"},
+                "last": {"url": base + "?page=3"},
+            }),
+            base + "?page=2": ([{"name": "repo2"}], {}),
+            base + "?page=3": ([{"name": "repo3"}], {}),
+        }
+        mock_get_json_page.side_effect = pages.get
+
+        with patch.object(GithubOrgClient, "_public_repos_url",
+                          new_callable=PropertyMock, return_value=base):
+            client = GithubOrgClient("testorg", max_workers=2)
+            self.assertEqual(client.public_repos(),
+                             ["repo1", "repo2", "repo3"])
+
+        self.assertEqual(mock_get_json_page.call_count, 3)
+
+    @patch("client.get_json_page")
+    def test_public_repos_next_links_only(self, mock_get_json_page):
+        """Test pages are followed one by one when no last link is given."""
+        base = "https://api.github.com/orgs/testorg/repos"
+        pages = {
+            base: ([{"name": "repo1"}], {"next": {"url": base + "?after=a"}}),
+            base + "?after=a": ([{"name": "repo2"}], {}),
+        }
+        mock_get_json_page.side_effect = pages.get
+
+        with patch.object(GithubOrgClient, "_public_repos_url",
+                          new_callable=PropertyMock, return_value=base):
+            client = GithubOrgClient("testorg")
+            repos = client.iter_public_repos()
+            # Names come out of a generator, page by page
+            self.assertEqual(next(repos), "repo1")
+            self.assertEqual(list(repos), ["repo2"])
+
     @parameterized.expand([
         (
             {"license": {"key": "my_license"}},  # repo data with license
@@ -117,16 +185,21 @@ class TestIntegrationGithubOrgClient(unittest.TestCase):
     def setUpClass(cls):
         """Set up class-level mocks """
         """that persist across all test methods."""
-        # Start patching requests.get
+        # Start patching the shared HTTP session
         # at the module level for integration testing
-        cls.get_patcher = patch('client.requests.get')
-        mock_get = cls.get_patcher.start()
+        cls.get_patcher = patch('utils.get_session')
+        mock_get = cls.get_patcher.start().return_value.get
+        # Always download, even when HTTP_CACHE_PATH enables the cache
+        cls.cache_patcher = patch('utils.http_cache', None)
+        cls.cache_patcher.start()
 
-        def side_effect(url):
+        def side_effect(url, **kwargs):
             """Mock function that returns different responses based on URL."""
-            mock_response = unittest.mock.Mock()
+            mock_response = unittest.mock.Mock(status_code=200, headers={})
             # Mock the raise_for_status method (doesn't need to do anything)
             mock_response.raise_for_status = unittest.mock.Mock()
+            # A single page: no Link header
+            mock_response.links = {}
 
             # Return appropriate test data based on the requested URL
             if url == "https://api.github.com/orgs/google":
@@ -145,6 +218,11 @@ class TestIntegrationGithubOrgClient(unittest.TestCase):
     def tearDownClass(cls):
         """Clean up class-level mocks after all tests complete."""
         cls.get_patcher.stop()
+        cls.cache_patcher.stop()
+
+    def setUp(self):
+        """Forget orgs fetched by earlier tests; the cache is shared."""
+        GithubOrgClient.org.cache_clear()
 
     def test_public_repos(self):
         """Test that public_repos"""
@@ -160,6 +238,104 @@ class TestIntegrationGithubOrgClient(unittest.TestCase):
         self.assertEqual(client.public_repos("apache-2.0"), self.apache2_repos)
 
 
+class FixtureHandler(BaseHTTPRequestHandler):
+    """Stand-in for api.github.com serving the payloads in fixtures.py.
+
+    Repos are served two per page with a Link header, like GitHub does.
+    """
+
+    per_page = 2
+    requests = []
+
+    def do_GET(self):
+        """Serve the org or one page of its repos."""
+        FixtureHandler.requests.append(self.path)
+        base = "http://%s:%d" % self.server.server_address
+        parts = urlparse(self.path)
+        headers = {}
+        if parts.path == "/orgs/google":
+            body = dict(fixtures.org_payload,
+                        repos_url=base + "/orgs/google/repos")
+        elif parts.path == "/orgs/google/repos":
+            page = int(parse_qs(parts.query).get("page", ["1"])[0])
+            repos = fixtures.repos_payload
+            last = (len(repos) + self.per_page - 1) // self.per_page
+            start = (page - 1) * self.per_page
+            body = repos[start:start + self.per_page]
+            if page < last:
+                url = base + parts.path
+                headers["Link"] = (f'<{url}?page={page + 1}>; rel="next", '
+                                   f'<{url}?page={last}>; rel="last"')
+        else:
+            self.send_error(404)
+            return
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        """Keep test output quiet."""
+
+
+@unittest.skipIf(utils.aiohttp is None, "aiohttp is not installed")
+@parameterized_class([{
+    "expected_repos": fixtures.expected_repos,
+    "apache2_repos": fixtures.apache2_repos
+}])
+class TestIntegrationAsyncGithubOrgClient(unittest.IsolatedAsyncioTestCase):
+    """Integration tests for AsyncGithubOrgClient against a local server."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Start the stand-in API server on a free port."""
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+        cls.base_url = "http://%s:%d" % cls.server.server_address
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Stop the stand-in API server."""
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        """Start each test with an empty request log."""
+        FixtureHandler.requests = []
+
+    async def asyncTearDown(self):
+        """Close the shared session before the test's loop goes away."""
+        await utils.close_async_session()
+
+    async def test_public_repos(self):
+        """Test every page of repos is fetched."""
+        client = AsyncGithubOrgClient("google", self.base_url)
+        self.assertEqual(await client.public_repos(), self.expected_repos)
+
+    async def test_public_repos_with_license(self):
+        """Test license filtering over the async client."""
+        client = AsyncGithubOrgClient("google", self.base_url)
+        self.assertEqual(await client.public_repos("apache-2.0"),
+                         self.apache2_repos)
+
+    async def test_org_fetched_once(self):
+        """Test concurrent callers share one org request."""
+        client = AsyncGithubOrgClient("google", self.base_url)
+        await asyncio.gather(*(client.org() for _ in range(5)))
+        await client.public_repos()
+        self.assertEqual(FixtureHandler.requests.count("/orgs/google"), 1)
+
+    async def test_public_repos_by_org(self):
+        """Test scanning several orgs at once."""
+        result = await public_repos_by_org(["google"], "apache-2.0",
+                                           base_url=self.base_url)
+        self.assertEqual(result, {"google": self.apache2_repos})
+
+
 # Standard Python idiom to run tests when script is executed directly
 if __name__ == "__main__":
     unittest.main()
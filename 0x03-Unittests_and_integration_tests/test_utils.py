@@ -1,9 +1,17 @@
 #!/usr/bin/env python3
 """Unit tests for utils.py functions."""
 
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
 import unittest
 from parameterized import parameterized
-from utils import access_nested_map, get_json, memoize
+import utils
+from utils import access_nested_map, get_json, memoize, memoize_method
+from concurrent.futures import Future
 from unittest.mock import patch, Mock
 
 
@@ -33,9 +41,50 @@ class TestAccessNestedMap(unittest.TestCase):
         self.assertEqual(str(cm.exception), repr(path[-1]))
 
 
+class TestPathExtractor(unittest.TestCase):
+    """Test cases for compiled multi-path extraction."""
+
+    document = {"a": {"b": 2, "c": [10, 20]}, "d": "x"}
+    paths = [("a", "b"), ("a", "c", 1), ("d",)]
+
+    def test_extract(self):
+        """Test every path is read from one document in order."""
+        extractor = utils.PathExtractor(self.paths)
+        self.assertEqual(extractor(self.document), (2, 20, "x"))
+
+    @parameterized.expand([
+        ({"a": {"c": []}, "d": "x"}, ("a", "b")),
+        ({"a": {"b": 2, "c": [10, 20]}}, ("d",)),
+    ])
+    def test_extract_missing_key(self, document, missing):
+        """Test a missing key raises KeyError like access_nested_map."""
+        extractor = utils.PathExtractor([("a", "b"), ("d",)])
+        with self.assertRaises(KeyError) as cm:
+            extractor(document)
+        self.assertEqual(str(cm.exception), repr(missing[-1]))
+
+    def test_extract_many_defaults(self):
+        """Test batch mode substitutes defaults for unreachable paths."""
+        extractor = utils.PathExtractor(self.paths)
+        documents = [self.document, {"a": 1}, {}]
+        self.assertEqual(list(extractor.extract_many(documents, default=0)),
+                         [(2, 20, "x"), (0, 0, 0), (0, 0, 0)])
+
+    def test_no_paths(self):
+        """Test an empty path list is rejected up front."""
+        with self.assertRaises(ValueError):
+            utils.PathExtractor([])
+
+
 class TestGetJson(unittest.TestCase):
     """Test cases for the get_json function."""
 
+    def setUp(self):
+        """Keep any HTTP_CACHE_PATH cache out of these tests."""
+        patcher = patch('utils.http_cache', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
     @parameterized.expand([
         # Test cases: (url, expected_json_payload)
         ("http://example.com", {"payload": True}),
@@ -43,21 +92,147 @@ class TestGetJson(unittest.TestCase):
     ])
     def test_get_json(self, test_url, test_payload):
         """Test get_json makes GET request & returns expected payload"""
-        # Mock the requests.get function to avoid actual HTTP calls
-        with patch('utils.requests.get') as mock_get:
+        # Mock the shared session to avoid actual HTTP calls
+        with patch('utils.get_session') as mock_get_session:
             # Create a mock response object
-            mock_response = Mock()
+            mock_response = Mock(status_code=200, headers={})
             mock_response.json.return_value = test_payload
-            mock_get.return_value = mock_response
+            mock_get_session.return_value.get.return_value = mock_response
 
             # Call the function under test
             result = get_json(test_url)
 
-            # Verify requests.get was called once with the correct URL
-            mock_get.assert_called_once_with(test_url)
+            # Verify the session was asked once for the URL, with a timeout
+            mock_get_session.return_value.get.assert_called_once_with(
+                test_url, timeout=utils.DEFAULT_TIMEOUT
+            )
             # Verify the function returns the expected JSON payload
             self.assertEqual(result, test_payload)
 
+    def test_get_json_page(self):
+        """Test get_json_page also returns the parsed Link header."""
+        links = {"next": {"url": "http://example.com?page=2", "rel": "next"}}
+        with patch('utils.get_session') as mock_get_session:
+            mock_response = Mock(status_code=200, headers={}, links=links)
+            mock_response.json.return_value = [1, 2]
+            mock_get_session.return_value.get.return_value = mock_response
+
+            self.assertEqual(utils.get_json_page("http://example.com"),
+                             ([1, 2], links))
+
+
+class TestHTTPCache(unittest.TestCase):
+    """Test cases for conditional requests served from HTTPCache."""
+
+    def setUp(self):
+        """Use a fresh cache file for every test."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = utils.HTTPCache(os.path.join(directory.name, "c.db"))
+        patcher = patch('utils.http_cache', self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def response(status_code, payload=None, headers=None):
+        """A requests.Response stand-in."""
+        body = json.dumps(payload).encode()
+        mock_response = Mock(status_code=status_code, content=body, links={})
+        mock_response.headers = headers or {}
+        mock_response.json.return_value = payload
+        return mock_response
+
+    def test_not_modified_served_from_cache(self):
+        """Test a 304 answer to a conditional request reuses the body."""
+        payload = {"login": "google"}
+        with patch('utils.get_session') as mock_get_session:
+            mock_get = mock_get_session.return_value.get
+            mock_get.return_value = self.response(
+                200, payload, {"ETag": '"abc"'}
+            )
+            self.assertEqual(get_json("http://example.com"), payload)
+
+            mock_get.return_value = self.response(304)
+            self.assertEqual(get_json("http://example.com"), payload)
+
+            mock_get.assert_called_with(
+                "http://example.com", timeout=utils.DEFAULT_TIMEOUT,
+                headers={"If-None-Match": '"abc"'}
+            )
+        self.assertEqual(self.cache.revalidated, 1)
+
+    def test_responses_without_validators_are_not_stored(self):
+        """Test only bodies with an ETag or Last-Modified are cached."""
+        with patch('utils.get_session') as mock_get_session:
+            mock_get_session.return_value.get.return_value = self.response(
+                200, {"payload": True}
+            )
+            get_json("http://example.com")
+        self.assertIsNone(self.cache.get("http://example.com"))
+
+    def test_enable_http_cache(self):
+        """Test the cache is only used once it has been enabled."""
+        path = os.path.join(os.path.dirname(self.cache.path), "enabled.db")
+        with patch('utils.http_cache', None):
+            cache = utils.enable_http_cache(path)
+            self.assertIs(utils.http_cache, cache)
+        self.assertEqual(cache.path, path)
+
+    def test_least_recently_used_evicted(self):
+        """Test stored bodies stay within max_bytes."""
+        self.cache.max_bytes = 250
+        for index in range(3):
+            # Random padding, so compression cannot shrink it away
+            self.cache.store(f"http://example.com/{index}", self.response(
+                200, {"index": index, "padding": os.urandom(64).hex()},
+                {"Last-Modified": "Wed, 21 Oct 2015 07:28:00 GMT"}
+            ))
+
+        self.assertIsNone(self.cache.get("http://example.com/0"))
+        self.assertIsNotNone(self.cache.get("http://example.com/2"))
+        self.assertLessEqual(self.cache.size(), 250)
+
+
+class TestSession(unittest.TestCase):
+    """Test cases for the shared HTTP session."""
+
+    def tearDown(self):
+        """Restore the default session options."""
+        utils.configure_session(pool_maxsize=10, timeout=utils.DEFAULT_TIMEOUT)
+
+    def test_session_is_reused(self):
+        """Test every call gets the same keep-alive session."""
+        self.assertIs(utils.get_session(), utils.get_session())
+
+    def test_configure_session(self):
+        """Test new options replace the session and size its pool."""
+        before = utils.get_session()
+        utils.configure_session(pool_maxsize=32)
+        session = utils.get_session()
+
+        self.assertIsNot(session, before)
+        adapter = session.get_adapter("https://api.github.com")
+        self.assertEqual(adapter._pool_maxsize, 32)
+
+    def test_async_session_scalar_timeout(self):
+        """Test a single timeout applies to both async phases."""
+        utils.configure_session(timeout=7)
+
+        async def open_session():
+            session = utils.get_async_session()
+            try:
+                return session.timeout
+            finally:
+                await utils.close_async_session()
+
+        timeout = asyncio.run(open_session())
+        self.assertEqual((timeout.sock_connect, timeout.sock_read), (7, 7))
+
+    def test_configure_session_unknown_option(self):
+        """Test misspelled options are rejected."""
+        with self.assertRaises(TypeError):
+            utils.configure_session(pool_size=32)
+
 
 class TestMemoize(unittest.TestCase):
     """Test cases for the memoize decorator."""
@@ -92,6 +267,143 @@ class TestMemoize(unittest.TestCase):
             # underlying method should only be called once
             mocked_method.assert_called_once()
 
+    def test_memoize_ttl_and_invalidate(self):
+        """Test a memoized property is recomputed after ttl or del."""
+
+        class TestClass:
+            calls = 0
+
+            @memoize(ttl=60)
+            def a_property(self):
+                TestClass.calls += 1
+                return TestClass.calls
+
+        test_obj = TestClass()
+        self.assertEqual(test_obj.a_property, 1)
+        self.assertEqual(test_obj.a_property, 1)
+
+        del test_obj.a_property
+        self.assertEqual(test_obj.a_property, 2)
+
+        later = time.monotonic() + 61
+        with patch('utils.time.monotonic', return_value=later):
+            self.assertEqual(test_obj.a_property, 3)
+
+
+class TestMemoizeMethod(unittest.TestCase):
+    """Test cases for the memoize_method decorator."""
+
+    def test_memoize_method_arguments(self):
+        """Test results are cached per arguments and can be invalidated."""
+
+        class TestClass:
+            def a_method(self, value):
+                return value * 2
+
+            @memoize_method(maxsize=2)
+            def doubled(self, value):
+                return self.a_method(value)
+
+        with patch.object(TestClass, "a_method",
+                          side_effect=lambda value: value * 2) as mocked:
+            test_obj = TestClass()
+            self.assertEqual(test_obj.doubled(1), 2)
+            self.assertEqual(test_obj.doubled(1), 2)
+            self.assertEqual(test_obj.doubled(2), 4)
+            self.assertEqual(mocked.call_count, 2)
+
+            test_obj.doubled.invalidate(1)
+            test_obj.doubled(1)
+            self.assertEqual(mocked.call_count, 3)
+
+            # Only the two most recently used results are kept
+            test_obj.doubled(3)
+            test_obj.doubled(2)
+            self.assertEqual(mocked.call_count, 5)
+
+    def test_memoize_method_shared_key(self):
+        """Test instances with the same key share one class-wide result."""
+
+        class TestClass:
+            calls = 0
+
+            def __init__(self, name):
+                self.name = name
+
+            @memoize_method(scope="class", key=lambda obj: obj.name)
+            def load(self):
+                TestClass.calls += 1
+                return self.name
+
+        self.assertEqual(TestClass("a").load(), "a")
+        self.assertEqual(TestClass("a").load(), "a")
+        self.assertEqual(TestClass("b").load(), "b")
+        self.assertEqual(TestClass.calls, 2)
+
+        TestClass("a").load.cache_clear()
+        TestClass("a").load()
+        TestClass("b").load()
+        self.assertEqual(TestClass.calls, 3)
+
+        TestClass.load.cache_clear()
+        TestClass("b").load()
+        self.assertEqual(TestClass.calls, 4)
+
+    def test_cache_clear_needs_instance(self):
+        """Test clearing every instance's results needs scope="class"."""
+
+        class TestClass:
+            @memoize_method()
+            def load(self):
+                return 1
+
+        with self.assertRaises(TypeError):
+            TestClass.load.cache_clear()
+
+    def test_memoize_method_single_flight(self):
+        """Test concurrent callers share a single computation."""
+        started = threading.Event()
+        release = threading.Event()
+
+        class TestClass:
+            calls = 0
+
+            @memoize_method()
+            def slow(self):
+                TestClass.calls += 1
+                started.set()
+                release.wait(5)
+                return "done"
+
+        # Counts callers blocked on the leader's result
+        waiting = threading.Semaphore(0)
+
+        class CountingFuture(Future):
+            def result(self, timeout=None):
+                waiting.release()
+                return super().result(timeout)
+
+        test_obj = TestClass()
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(test_obj.slow()))
+            for _ in range(5)
+        ]
+        with patch('utils.Future', CountingFuture):
+            threads[0].start()
+            started.wait(5)
+            for thread in threads[1:]:
+                thread.start()
+            # Only finish once every follower is waiting on the flight
+            for _ in threads[1:]:
+                self.assertTrue(waiting.acquire(timeout=5))
+            release.set()
+            for thread in threads:
+                thread.join(5)
+
+        self.assertEqual(results, ["done"] * 5)
+        self.assertEqual(TestClass.calls, 1)
+
 
 # Standard Python idiom to run tests when script is executed directly
 if __name__ == "__main__":
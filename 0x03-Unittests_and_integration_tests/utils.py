@@ -1,26 +1,552 @@
+import asyncio
+import functools
+import json
+import os
+import sqlite3
+import threading
+import time
+import weakref
+import zlib
+from collections import OrderedDict, namedtuple
+from concurrent.futures import Future
+
 import requests
+from requests.adapters import HTTPAdapter
+from requests.utils import parse_header_links
+
+try:
+    import aiohttp
+except ImportError:  # only needed for the async client
+    aiohttp = None
+
+
+# What a missing or non-subscriptable step raises
+_LOOKUP_ERRORS = (KeyError, IndexError, TypeError)
+_NO_DEFAULT = object()
+
+
+def _lookup_source(index, path):
+    """Python source subscripting d along path, e.g. d[k0_0][k0_1]."""
+    return "d" + "".join(f"[k{index}_{depth}]" for depth in range(len(path)))
+
+
+def _build(lines, paths):
+    namespace = {"LOOKUP_ERRORS": _LOOKUP_ERRORS}
+    for index, path in enumerate(paths):
+        for depth, key in enumerate(path):
+            namespace[f"k{index}_{depth}"] = key
+    exec("\n".join(lines), namespace)
+    return namespace["extract"]
+
+
+class PathExtractor:
+    """Pulls a fixed set of key paths out of nested maps in one pass.
+
+    The lookups are compiled once into a single function, so extracting
+    the same paths from many documents skips the per-key interpreter loop.
+    """
+
+    def __init__(self, paths):
+        self.paths = tuple(tuple(path) for path in paths)
+        if not self.paths:
+            raise ValueError("PathExtractor needs at least one path")
+        lookups = ", ".join(_lookup_source(index, path)
+                            for index, path in enumerate(self.paths))
+        self._strict = _build([
+            "def extract(d):",
+            f"    return ({lookups},)",
+        ], self.paths)
+        self._lenient = None
+
+    def _lenient_extract(self):
+        # Compiled on first use; most callers only need one of the modes
+        if self._lenient is None:
+            lines = ["def extract(d, default):"]
+            for index, path in enumerate(self.paths):
+                lines += [
+                    "    try:",
+                    f"        v{index} = {_lookup_source(index, path)}",
+                    "    except LOOKUP_ERRORS:",
+                    f"        v{index} = default",
+                ]
+            values = ", ".join(f"v{index}" for index in range(len(self.paths)))
+            lines.append(f"    return ({values},)")
+            self._lenient = _build(lines, self.paths)
+        return self._lenient
+
+    def extract(self, nested_map, default=_NO_DEFAULT):
+        """Tuple of the values at each path.
+
+        Without default a missing key raises as access_nested_map does;
+        with it, paths that cannot be followed yield default instead.
+        """
+        if default is _NO_DEFAULT:
+            return self._strict(nested_map)
+        return self._lenient_extract()(nested_map, default)
+
+    __call__ = extract
+
+    def extract_many(self, nested_maps, default=None):
+        """Yield a tuple per document, with default for missing paths."""
+        extract = self._lenient_extract()
+        for nested_map in nested_maps:
+            yield extract(nested_map, default)
 
 
 def access_nested_map(nested_map, path):
-    """Access a nested map with a path of keys."""
+    """Access a nested map with a path of keys.
+
+    To read the same paths from many maps, use PathExtractor.
+    """
     for key in path:
         nested_map = nested_map[key]
     return nested_map
 
-def get_json(url):
-    response = requests.get(url)
-    return response.json()
+
+# (connect, read) timeouts in seconds
+DEFAULT_TIMEOUT = (3.05, 10)
+
+_session = None
+_session_lock = threading.Lock()
+_session_options = {
+    "pool_connections": 10,
+    "pool_maxsize": 10,
+    "max_retries": 0,
+    "timeout": DEFAULT_TIMEOUT,
+}
+
+
+def configure_session(**options):
+    """Change pool size, retries or timeout of the shared HTTP session.
+
+    The current session is closed; the next request opens a new one.
+    """
+    global _session
+    unknown = set(options) - set(_session_options)
+    if unknown:
+        names = ", ".join(sorted(unknown))
+        raise TypeError(f"Unknown session options: {names}")
+    with _session_lock:
+        _session_options.update(options)
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+def get_session():
+    """Return the process-wide keep-alive session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=_session_options["pool_connections"],
+                    pool_maxsize=_session_options["pool_maxsize"],
+                    max_retries=_session_options["max_retries"],
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+CachedResponse = namedtuple(
+    "CachedResponse", ["etag", "last_modified", "link", "body"]
+)
+
+
+class HTTPCache:
+    """On-disk store of response bodies with their ETag/Last-Modified.
+
+    Entries are kept in an SQLite file shared by every process; once the
+    stored bodies exceed max_bytes the least recently used are evicted.
+    """
+
+    def __init__(self, path, max_bytes=50 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.revalidated = 0
+        self.stored = 0
+        self._local = threading.local()
+
+    def _connection(self):
+        # One connection per thread, opened on first use
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0,
+                                   isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS http_cache (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                link TEXT,
+                body BLOB NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS http_cache_lru"
+                         " ON http_cache (last_access)")
+            self._local.conn = conn
+        return conn
+
+    def get(self, url):
+        """The cached response for url, or None."""
+        row = self._connection().execute(
+            "SELECT etag, last_modified, link, body FROM http_cache"
+            " WHERE url = ?", (url,)
+        ).fetchone()
+        if row is None:
+            return None
+        return CachedResponse(row[0], row[1], row[2], zlib.decompress(row[3]))
+
+    def touch(self, url):
+        """Mark url as just revalidated, for LRU eviction."""
+        self.revalidated += 1
+        self._connection().execute(
+            "UPDATE http_cache SET last_access = ? WHERE url = ?",
+            (time.time(), url)
+        )
+
+    def store(self, url, response):
+        """Keep a 200 response that carries a validator."""
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if etag is None and last_modified is None:
+            return
+        body = zlib.compress(response.content)
+        if len(body) > self.max_bytes:
+            return
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO http_cache"
+                " (url, etag, last_modified, link, body, last_access)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (url, etag, last_modified, response.headers.get("Link"),
+                 body, time.time())
+            )
+            # Keep the most recently used bodies whose running total fits
+            conn.execute(
+                "DELETE FROM http_cache WHERE url IN ("
+                " SELECT url FROM (SELECT url, SUM(length(body))"
+                " OVER (ORDER BY last_access DESC, url) AS total"
+                " FROM http_cache) WHERE total > ?)",
+                (self.max_bytes,)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self.stored += 1
+
+    def size(self):
+        """Bytes of (compressed) bodies currently stored."""
+        return self._connection().execute(
+            "SELECT COALESCE(SUM(length(body)), 0) FROM http_cache"
+        ).fetchone()[0]
+
+    def clear(self):
+        self._connection().execute("DELETE FROM http_cache")
+
+
+DEFAULT_HTTP_CACHE_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "http_cache.db"
+)
+
+# Shared by get_json and get_json_page. Off unless HTTP_CACHE_PATH is set
+# or enable_http_cache() is called; set back to None to disable it.
+http_cache = (HTTPCache(os.environ["HTTP_CACHE_PATH"])
+              if os.environ.get("HTTP_CACHE_PATH") else None)
+
+
+def enable_http_cache(path=DEFAULT_HTTP_CACHE_PATH,
+                      max_bytes=50 * 1024 * 1024):
+    """Revalidate GETs against an on-disk cache at path and return it."""
+    global http_cache
+    http_cache = HTTPCache(path, max_bytes)
+    return http_cache
+
+
+def _links(header):
+    """Parse a Link header the way requests does for response.links."""
+    links = {}
+    for link in parse_header_links(header or ""):
+        links[link.get("rel") or link.get("url")] = link
+    return links
+
+
+def _fetch(url, timeout=None):
+    """GET url, revalidating a cached copy; returns (payload, links)."""
+    if timeout is None:
+        timeout = _session_options["timeout"]
+    cache = http_cache
+    cached = cache.get(url) if cache is not None else None
+    if cached is None:
+        response = get_session().get(url, timeout=timeout)
+    else:
+        headers = {}
+        if cached.etag:
+            headers["If-None-Match"] = cached.etag
+        if cached.last_modified:
+            headers["If-Modified-Since"] = cached.last_modified
+        response = get_session().get(url, timeout=timeout, headers=headers)
+        if response.status_code == 304:
+            cache.touch(url)
+            return json.loads(cached.body), _links(cached.link)
+    response.raise_for_status()
+    if cache is not None and response.status_code == 200:
+        cache.store(url, response)
+    return response.json(), response.links
+
+
+def get_json(url, timeout=None):
+    """GET url over the shared session and decode the JSON body.
+
+    Bodies served with an ETag or Last-Modified are kept in http_cache and
+    later requests for the same URL are conditional.
+    """
+    return _fetch(url, timeout)[0]
+
+
+def get_json_page(url, timeout=None):
+    """Like get_json, but also return the response's Link header.
+
+    Links are parsed by requests into {rel: {"url": ..., "rel": ...}}.
+    """
+    return _fetch(url, timeout)
+
+
+# One aiohttp session per event loop; sessions cannot move between loops
+_async_sessions = weakref.WeakKeyDictionary()
+
+
+def get_async_session():
+    """Return the keep-alive aiohttp session for the running loop.
+
+    It takes its connection limit and timeouts from configure_session;
+    changes apply to sessions opened after close_async_session().
+    """
+    loop = asyncio.get_running_loop()
+    session = _async_sessions.get(loop)
+    if session is None or session.closed:
+        if aiohttp is None:
+            raise RuntimeError("aiohttp is required for async requests")
+        timeout = _session_options["timeout"]
+        if timeout is None or isinstance(timeout, (int, float)):
+            # requests applies a single value to both phases
+            connect = read = timeout
+        else:
+            connect, read = timeout
+        session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=_session_options["pool_maxsize"]
+            ),
+            timeout=aiohttp.ClientTimeout(sock_connect=connect,
+                                          sock_read=read),
+        )
+        _async_sessions[loop] = session
+    return session
+
+
+async def close_async_session():
+    """Close the running loop's session, if one was opened."""
+    session = _async_sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None:
+        await session.close()
+
+
+async def get_json_page_async(url):
+    """Async get_json_page over the loop's shared session."""
+    async with get_async_session().get(url) as response:
+        response.raise_for_status()
+        payload = await response.json(content_type=None)
+        # Same shape as requests' response.links
+        links = {rel: {"url": str(link["url"]), "rel": rel}
+                 for rel, link in response.links.items()}
+        return payload, links
+
+
+async def get_json_async(url):
+    """Async get_json over the loop's shared session."""
+    return (await get_json_page_async(url))[0]
+
 
 # utils.py
 
-def memoize(fn):
-    """Memoization decorator for a method."""
-    attr_name = "_memoized_" + fn.__name__
+class _MemoStore:
+    """Results of one memoized method, in least recently used order."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        # Computations in progress, so concurrent callers wait for one result
+        self.flights = {}
+
+
+class Memoized:
+    """Descriptor behind memoize and memoize_method.
+
+    Results are cached per instance (or, with scope="class", in one store
+    shared by every instance) for ttl seconds, at most maxsize of them.
+    With scope="class", key(instance) may stand in for the instance, so
+    instances with the same key share results. Concurrent calls with the
+    same arguments run the method once.
+    """
+
+    def __init__(self, fn, ttl=None, maxsize=128, scope="instance",
+                 as_property=False, key=None):
+        if scope not in ("instance", "class"):
+            raise ValueError("scope must be 'instance' or 'class'")
+        if key is not None and scope != "class":
+            raise ValueError("key needs scope='class'")
+        functools.update_wrapper(self, fn)
+        self.fn = fn
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.scope = scope
+        self.as_property = as_property
+        self.key = key
+        self.attr_name = "_memoized_" + fn.__name__
+        self._lock = threading.Lock()
+        self._class_store = _MemoStore()
+
+    def _store(self, instance):
+        if self.scope == "class":
+            return self._class_store
+        store = instance.__dict__.get(self.attr_name)
+        if store is None:
+            with self._lock:
+                store = instance.__dict__.setdefault(self.attr_name,
+                                                     _MemoStore())
+        return store
+
+    def _owner(self, instance):
+        return instance if self.key is None else self.key(instance)
+
+    def _key(self, instance, args, kwargs):
+        key = (args, tuple(sorted(kwargs.items()))) if kwargs else args
+        return (self._owner(instance), key) if self.scope == "class" else key
+
+    def call(self, instance, args=(), kwargs=None):
+        kwargs = kwargs or {}
+        store = self._store(instance)
+        key = self._key(instance, args, kwargs)
+        with store.lock:
+            entry = store.entries.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires is None or time.monotonic() < expires:
+                    store.entries.move_to_end(key)
+                    return value
+                del store.entries[key]
+            flight = store.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = store.flights[key] = Future()
+        if not leader:
+            return flight.result()
+
+        try:
+            value = self.fn(instance, *args, **kwargs)
+        except BaseException as e:
+            # Failures are shared with the waiting callers but not cached
+            with store.lock:
+                del store.flights[key]
+            flight.set_exception(e)
+            raise
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+        with store.lock:
+            store.entries[key] = (value, expires)
+            while len(store.entries) > self.maxsize:
+                store.entries.popitem(last=False)
+            del store.flights[key]
+        flight.set_result(value)
+        return value
+
+    def invalidate(self, instance, args=(), kwargs=None):
+        """Forget the result for these arguments."""
+        store = self._store(instance)
+        with store.lock:
+            store.entries.pop(self._key(instance, args, kwargs or {}), None)
+
+    def cache_clear(self, instance=None):
+        """Forget every result of this instance.
+
+        Without an instance (Cls.method.cache_clear()), forget every result;
+        that needs scope="class", as instance stores live on the instances.
+        """
+        if instance is None and self.scope != "class":
+            raise TypeError("cache_clear() needs an instance unless "
+                            "scope='class'")
+        store = self._store(instance)
+        with store.lock:
+            if self.scope == "class" and instance is not None:
+                owner = self._owner(instance)
+                for key in [k for k in store.entries if k[0] == owner]:
+                    del store.entries[key]
+            else:
+                store.entries.clear()
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        if self.as_property:
+            return self.call(instance)
+        return BoundMemoized(self, instance)
+
+    def __delete__(self, instance):
+        # "del obj.prop" drops a memoized property's value
+        self.invalidate(instance)
+
+
+class BoundMemoized:
+    """A memoized method bound to its instance."""
+
+    __slots__ = ("memoized", "instance")
+
+    def __init__(self, memoized, instance):
+        self.memoized = memoized
+        self.instance = instance
+
+    def __call__(self, *args, **kwargs):
+        return self.memoized.call(self.instance, args, kwargs)
+
+    def invalidate(self, *args, **kwargs):
+        """Forget the result for these arguments."""
+        self.memoized.invalidate(self.instance, args, kwargs)
+
+    def cache_clear(self):
+        """Forget every result of this instance."""
+        self.memoized.cache_clear(self.instance)
+
+
+def memoize(fn=None, *, ttl=None):
+    """Memoization decorator for a method.
+
+    The method becomes a property computed once per instance (or again once
+    ttl seconds have passed); "del obj.prop" forces a recompute.
+    """
+    def decorator(fn):
+        return Memoized(fn, ttl=ttl, maxsize=1, as_property=True)
+
+    if fn is None:
+        return decorator
+    return decorator(fn)
+
+
+def memoize_method(ttl=None, maxsize=128, scope="instance", key=None):
+    """Memoize a method with arguments, keyed by its (hashable) arguments.
 
-    @property
-    def memoized(self):
-        if not hasattr(self, attr_name):
-            setattr(self, attr_name, fn(self))
-        return getattr(self, attr_name)
+    The method stays callable and gains invalidate(*args) and cache_clear().
+    """
+    def decorator(fn):
+        return Memoized(fn, ttl=ttl, maxsize=maxsize, scope=scope, key=key)
 
-    return memoized
\ No newline at end of file
+    return decorator
@@ -1,49 +1,219 @@
+import queue
 import sqlite3
+import threading
+import time
+
+from db_errors import PoolTimeoutError, QueryTimeoutError, is_interrupted
+from db_tracing import default_tracer
+
+
+class ConnectionPool:
+    """Keeps open sqlite3 connections to one database for reuse."""
+
+    def __init__(self, db_name, max_size=5, timeout=5.0):
+        self.db_name = db_name
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Borrow an idle connection, opening one if the pool is not full."""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            create = self._created < self.max_size
+            if create:
+                self._created += 1
+        if create:
+            # Connections move between threads as they are borrowed and returned
+            return sqlite3.connect(self.db_name, timeout=self.timeout, check_same_thread=False)
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise PoolTimeoutError(
+                f"All {self.max_size} connections to {self.db_name} stayed busy for {self.timeout}s"
+            ) from None
+
+    def release(self, connection):
+        """Return a connection; anything left uncommitted is rolled back."""
+        connection.set_progress_handler(None, 0)
+        if connection.in_transaction:
+            connection.rollback()
+        self._idle.put(connection)
+
+    def close(self):
+        """Close every idle connection."""
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            connection.close()
+            with self._lock:
+                self._created -= 1
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_name, max_size=5):
+    """Return the shared pool for db_name, creating it on first use."""
+    with _pools_lock:
+        if db_name not in _pools:
+            _pools[db_name] = ConnectionPool(db_name, max_size)
+        return _pools[db_name]
+
+
+# Connection currently checked out by each thread, per database
+_active = threading.local()
+
 
 class DatabaseConnection:
-    """Custom context manager for handling database connections."""
-    
-    def __init__(self, db_name="example.db"):
+    """Custom context manager for handling database connections.
+
+    Connections are borrowed from a shared pool. A nested block for the same
+    database in the same thread reuses the outer connection and runs inside
+    a savepoint, so only the outermost block commits or rolls back.
+
+    With timeout, statements still running that many seconds after the block
+    was entered are interrupted through a progress handler and the block
+    raises QueryTimeoutError; the connection still goes back to the pool.
+
+    The outermost block records connect and commit/rollback spans on tracer.
+    """
+
+    def __init__(self, db_name="example.db", timeout=None, tracer=None):
         self.db_name = db_name
+        self.timeout = timeout
+        self.tracer = tracer or default_tracer
         self.connection = None
-    
+        self._savepoints = []
+        self._deadlines = []
+
     def __enter__(self):
         """Enter the context and return the database connection."""
-        self.connection = sqlite3.connect(self.db_name)
+        active = getattr(_active, "connections", None)
+        if active is None:
+            active = _active.connections = {}
+
+        if self.db_name in active:
+            self.connection, depth, deadlines = active[self.db_name]
+            savepoint = f"sp_{depth}"
+            # A savepoint outside a transaction would commit on release
+            if not self.connection.in_transaction:
+                self.connection.execute("BEGIN")
+            self.connection.execute(f"SAVEPOINT {savepoint}")
+            active[self.db_name] = (self.connection, depth + 1, deadlines)
+            self._savepoints.append(savepoint)
+        else:
+            with self.tracer.span("connect", self.db_name):
+                self.connection = get_pool(self.db_name).acquire()
+            # Deadlines of every block open on this connection; the earliest wins
+            deadlines = []
+            active[self.db_name] = (self.connection, 1, deadlines)
+            self._savepoints.append(None)
+
+        deadline = None
+        if self.timeout is not None:
+            deadline = time.monotonic() + self.timeout
+            if not deadlines:
+                self.connection.set_progress_handler(
+                    lambda: 1 if deadlines and time.monotonic() >= min(deadlines) else 0, 1000
+                )
+            deadlines.append(deadline)
+        self._deadlines.append(deadline)
         return self.connection
-    
+
     def __exit__(self, exc_type, exc_value, traceback):
-        """Exit the context and close the database connection."""
-        if self.connection:
-            if exc_type is None:
-                # Commit if no exception occurred
-                self.connection.commit()
-            else:
-                # Rollback if an exception occurred
-                self.connection.rollback()
-            self.connection.close()
-        
+        """Exit the context and hand the connection back to the pool."""
+        savepoint = self._savepoints.pop()
+        deadline = self._deadlines.pop()
+        active = _active.connections
+        connection, depth, deadlines = active[self.db_name]
+        timed_out = False
+        if deadline is not None:
+            # Drop it first so the cleanup statements below are not interrupted
+            deadlines.remove(deadline)
+            timed_out = is_interrupted(exc_value) and time.monotonic() >= deadline
+
+        if savepoint is not None:
+            if exc_type is not None:
+                connection.execute(f"ROLLBACK TO SAVEPOINT {savepoint}")
+            connection.execute(f"RELEASE SAVEPOINT {savepoint}")
+            active[self.db_name] = (connection, depth - 1, deadlines)
+        else:
+            del active[self.db_name]
+            try:
+                if exc_type is None:
+                    # Commit if no exception occurred
+                    with self.tracer.span("commit", self.db_name):
+                        connection.commit()
+                else:
+                    # Rollback if an exception occurred
+                    with self.tracer.span("rollback", self.db_name):
+                        connection.rollback()
+            finally:
+                get_pool(self.db_name).release(connection)
+
+        if timed_out:
+            raise QueryTimeoutError(f"Query exceeded its {self.timeout}s deadline") from exc_value
+
         # Return False to propagate any exceptions
         return False
 
-# Example 
+# Example
 if __name__ == "__main__":
     # First, let's create a sample database with users table
     with sqlite3.connect("example.db") as conn:
         cursor = conn.cursor()
-        cursor.execute('''CREATE TABLE IF NOT EXISTS users 
+        cursor.execute('''CREATE TABLE IF NOT EXISTS users
                          (id INTEGER PRIMARY KEY, name TEXT, age INTEGER)''')
         cursor.execute("INSERT OR REPLACE INTO users (id, name, age) VALUES (1, 'Alice', 30)")
         cursor.execute("INSERT OR REPLACE INTO users (id, name, age) VALUES (2, 'Bob', 25)")
         cursor.execute("INSERT OR REPLACE INTO users (id, name, age) VALUES (3, 'Charlie', 45)")
         conn.commit()
-    
+
     # Now use our custom context manager
     with DatabaseConnection("example.db") as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM users")
         results = cursor.fetchall()
-        
+
         print("Query results:")
         for row in results:
-            print(f"ID: {row[0]}, Name: {row[1]}, Age: {row[2]}")
\ No newline at end of file
+            print(f"ID: {row[0]}, Name: {row[1]}, Age: {row[2]}")
+
+    # Nested blocks share one pooled connection; the inner one is a savepoint
+    with DatabaseConnection("example.db") as outer:
+        outer.execute("UPDATE users SET age = age + 1 WHERE id = 1")
+        try:
+            with DatabaseConnection("example.db") as inner:
+                print(f"\nNested block reuses the connection: {inner is outer}")
+                inner.execute("UPDATE users SET age = 0 WHERE id = 2")
+                raise ValueError("undo only the inner block")
+        except ValueError:
+            pass
+
+    with DatabaseConnection("example.db") as conn:
+        ages = conn.execute("SELECT name, age FROM users WHERE id IN (1, 2)").fetchall()
+        print(f"After nested rollback: {ages}")
+
+    # Where the time went, per phase
+    for name, phases in default_tracer.summary().items():
+        for phase, stats in phases.items():
+            print(f"{name} {phase}: {stats['count']} calls, avg {stats['avg']:.6f}s")
+
+    # A runaway query is interrupted and its connection returned to the pool
+    try:
+        with DatabaseConnection("example.db", timeout=0.5) as conn:
+            conn.execute("""
+                WITH RECURSIVE counter(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM counter)
+                SELECT COUNT(*) FROM counter
+            """).fetchone()
+    except QueryTimeoutError as e:
+        print(f"Runaway query stopped: {e}")
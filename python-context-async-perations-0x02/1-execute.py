@@ -1,37 +1,197 @@
 import sqlite3
+import time
+from itertools import islice
+
+from db_errors import QueryTimeoutError, is_interrupted
+from db_tracing import default_tracer
+
+
+class Deadline:
+    """SQLite progress handler that aborts statements after timeout seconds."""
+
+    def __init__(self, timeout, check_every=1000):
+        self.timeout = timeout
+        self.check_every = check_every
+        self.expires_at = time.monotonic() + timeout
+
+    @property
+    def expired(self):
+        return time.monotonic() >= self.expires_at
+
+    def __call__(self):
+        # Any non-zero return makes SQLite interrupt the running statement
+        return 1 if self.expired else 0
+
+    def install(self, connection):
+        connection.set_progress_handler(self, self.check_every)
+
+    def translate(self, error):
+        """Return the error to raise for an OperationalError seen under this deadline."""
+        if is_interrupted(error) and self.expired:
+            timeout_error = QueryTimeoutError(f"Query exceeded its {self.timeout}s deadline")
+            timeout_error.__cause__ = error
+            return timeout_error
+        return error
+
+
+class StreamingResult:
+    """Lazy iterator over a cursor, pulling rows in fetchmany chunks."""
+
+    def __init__(self, cursor, chunk_size, deadline=None, span=None):
+        self.cursor = cursor
+        self.chunk_size = chunk_size
+        self.deadline = deadline
+        # Starts a fetch span per chunk when given
+        self.span = span
+        self.closed = False
+
+    def __iter__(self):
+        while True:
+            if self.closed:
+                raise sqlite3.ProgrammingError("Result stream used after the with block exited")
+            try:
+                if self.span is not None:
+                    with self.span() as span:
+                        rows = self.cursor.fetchmany(self.chunk_size)
+                        span.attributes["rows"] = len(rows)
+                else:
+                    rows = self.cursor.fetchmany(self.chunk_size)
+            except sqlite3.OperationalError as e:
+                if self.deadline is None:
+                    raise
+                raise self.deadline.translate(e)
+            if not rows:
+                return
+            yield from rows
+
+    def close(self):
+        self.closed = True
+        self.cursor.close()
+
 
 class ExecuteQuery:
-    """Reusable context manager that executes a query and manages connection."""
+    """Reusable context manager that executes a query and manages connection.
+
+    With stream=True the block receives a lazy iterator instead of a list;
+    rows are fetched chunk_size at a time while the connection stays open.
+    With timeout, any statement still running that many seconds after entry
+    is interrupted and QueryTimeoutError is raised. Connect, execute, fetch
+    and commit/rollback are recorded as spans on tracer.
+    """
     
-    def __init__(self, db_name, query, params=None):
+    def __init__(self, db_name, query, params=None, stream=False, chunk_size=500, timeout=None,
+                 tracer=None):
         self.db_name = db_name
         self.query = query
         self.params = params or ()
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.tracer = tracer or default_tracer
         self.connection = None
         self.results = None
+        self.deadline = None
+
+    def _span(self, phase, **attributes):
+        return self.tracer.span(phase, self.db_name, self.query, **attributes)
+
+    def _open(self):
+        with self._span("connect"):
+            self.connection = sqlite3.connect(self.db_name)
+        if self.timeout is not None:
+            self.deadline = Deadline(self.timeout)
+            self.deadline.install(self.connection)
+        return self.connection.cursor()
+
+    def _abort(self, error):
+        """__exit__ does not run when __enter__ fails, so clean up here."""
+        self.connection.rollback()
+        self.connection.close()
+        if self.deadline is not None:
+            return self.deadline.translate(error)
+        return error
     
     def __enter__(self):
         """Enter the context, execute query, and return results."""
-        self.connection = sqlite3.connect(self.db_name)
-        cursor = self.connection.cursor()
-        cursor.execute(self.query, self.params)
-        self.results = cursor.fetchall()
+        cursor = self._open()
+        try:
+            with self._span("execute"):
+                cursor.execute(self.query, self.params)
+            if self.stream:
+                self.results = StreamingResult(cursor, self.chunk_size, self.deadline,
+                                               lambda: self._span("fetch"))
+            else:
+                with self._span("fetch") as span:
+                    self.results = cursor.fetchall()
+                    span.attributes["rows"] = len(self.results)
+        except Exception as e:
+            error = self._abort(e)
+            if error is e:
+                raise
+            raise error
         return self.results
     
     def __exit__(self, exc_type, exc_value, traceback):
         """Exit the context and close the database connection."""
+        if isinstance(self.results, StreamingResult):
+            self.results.close()
         if self.connection:
             if exc_type is None:
                 # Commit if no exception occurred
-                self.connection.commit()
+                with self._span("commit"):
+                    self.connection.commit()
             else:
                 # Rollback if an exception occurred
-                self.connection.rollback()
+                with self._span("rollback"):
+                    self.connection.rollback()
             self.connection.close()
+
+        if self.deadline is not None and exc_value is not None:
+            error = self.deadline.translate(exc_value)
+            if error is not exc_value:
+                raise error
         
         # Return False to propagate any exceptions
         return False
 
+class BulkExecuteQuery(ExecuteQuery):
+    """Runs one statement for every parameter tuple in a single transaction.
+
+    Parameters are consumed lazily and passed to executemany chunk_size at a
+    time; the block receives the total number of affected rows.
+    """
+
+    def __init__(self, db_name, query, param_rows, chunk_size=1000, timeout=None, tracer=None):
+        super().__init__(db_name, query, chunk_size=chunk_size, timeout=timeout, tracer=tracer)
+        self.param_rows = param_rows
+
+    def __enter__(self):
+        """Enter the context, run every chunk, and return the affected row count."""
+        cursor = self._open()
+        try:
+            # Explicit so every chunk lands in the same transaction
+            cursor.execute("BEGIN")
+            rows = iter(self.param_rows)
+            affected = 0
+            while True:
+                chunk = list(islice(rows, self.chunk_size))
+                if not chunk:
+                    break
+                with self._span("execute", rows=len(chunk)):
+                    cursor.executemany(self.query, chunk)
+                affected += cursor.rowcount
+        except Exception as e:
+            error = self._abort(e)
+            if error is e:
+                raise
+            raise error
+        except BaseException:
+            self._abort(None)
+            raise
+        self.results = affected
+        return self.results
+
+
 # Example
 if __name__ == "__main__":
     # First, let's create a sample database with users table
@@ -53,4 +213,34 @@ if __name__ == "__main__":
     with ExecuteQuery("example.db", query, parameter) as results:
         print("Users older than 25:")
         for row in results:
-            print(f"ID: {row[0]}, Name: {row[1]}, Age: {row[2]}")
\ No newline at end of file
+            print(f"ID: {row[0]}, Name: {row[1]}, Age: {row[2]}")
+
+    # Stream the same query without materializing the whole result set
+    with ExecuteQuery("example.db", query, parameter, stream=True, chunk_size=2) as rows:
+        print("\nStreaming users older than 25:")
+        for row in rows:
+            print(f"ID: {row[0]}, Name: {row[1]}, Age: {row[2]}")
+
+    # Insert many rows through executemany, in one transaction
+    new_users = ((user_id, f"User {user_id}", 20 + user_id % 40) for user_id in range(100, 1100))
+    insert = "INSERT OR REPLACE INTO users (id, name, age) VALUES (?, ?, ?)"
+    with BulkExecuteQuery("example.db", insert, new_users, chunk_size=250) as affected:
+        print(f"\nBulk insert affected {affected} rows")
+
+    # A runaway query is interrupted once its deadline passes
+    runaway = """
+        WITH RECURSIVE counter(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM counter)
+        SELECT COUNT(*) FROM counter
+    """
+    try:
+        with ExecuteQuery("example.db", runaway, timeout=0.5) as results:
+            print(results)
+    except QueryTimeoutError as e:
+        print(f"\nRunaway query stopped: {e}")
+
+    # Latency per query fingerprint, split into connect/execute/fetch/commit
+    print("\nLatency breakdown:")
+    for fingerprint, phases in default_tracer.summary().items():
+        print(f"  {fingerprint[:60]}")
+        for phase, stats in phases.items():
+            print(f"    {phase:<8} {stats['count']:>3} spans  avg {stats['avg']:.6f}s  p99 <= {stats['p99']}s")
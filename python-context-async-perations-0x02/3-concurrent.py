@@ -1,6 +1,702 @@
 import asyncio
+import contextvars
+import operator
+import re
+import time
+import weakref
 import aiosqlite
 import sqlite3
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from db_errors import QueryTimeoutError, is_interrupted
+from db_tracing import InMemoryExporter, Tracer, default_tracer
+
+
+class AsyncConnectionPool:
+    """Keeps open aiosqlite connections to one database for reuse.
+
+    Use it as ``async with`` or call close(); each open connection keeps an
+    aiosqlite worker thread alive.
+    """
+
+    def __init__(self, db_name, max_size=5):
+        self.db_name = db_name
+        self.max_size = max_size
+        self._idle = asyncio.LifoQueue()
+        self._created = 0
+        self.closed = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+        return False
+
+    async def acquire(self):
+        """Borrow an idle connection, opening one if the pool is not full."""
+        if self.closed:
+            raise sqlite3.ProgrammingError("Cannot acquire from a closed pool")
+        if self._idle.empty() and self._created < self.max_size:
+            self._created += 1
+            try:
+                return await aiosqlite.connect(self.db_name)
+            except BaseException:
+                self._created -= 1
+                raise
+        return await self._idle.get()
+
+    async def release(self, connection):
+        """Return a connection; anything left uncommitted is rolled back."""
+        await connection.set_progress_handler(None, 0)
+        if connection.in_transaction:
+            await connection.rollback()
+        if self.closed:
+            # Checked out when the pool closed
+            await connection.close()
+            self._created -= 1
+            return
+        self._idle.put_nowait(connection)
+
+    async def close(self):
+        """Close every idle connection; borrowed ones close on release."""
+        self.closed = True
+        while not self._idle.empty():
+            connection = self._idle.get_nowait()
+            await connection.close()
+            self._created -= 1
+
+
+# asyncio queues belong to one event loop, so pools are kept per loop and
+# dropped with it
+_pools = weakref.WeakKeyDictionary()
+
+
+async def _close_pools_at_shutdown():
+    try:
+        await asyncio.get_running_loop().create_future()
+    finally:
+        await close_async_pools()
+
+
+def get_async_pool(db_name, max_size=5):
+    """Return the shared pool for db_name on the running loop.
+
+    The loop's pools are closed when asyncio.run() cancels its remaining
+    tasks on the way out; loops driven by hand should await
+    close_async_pools() before closing.
+    """
+    loop = asyncio.get_running_loop()
+    pools = _pools.get(loop)
+    if pools is None:
+        pools = _pools[loop] = {}
+        # Held here so the pending task is not garbage collected
+        pools[None] = loop.create_task(_close_pools_at_shutdown())
+    if db_name not in pools:
+        pools[db_name] = AsyncConnectionPool(db_name, max_size)
+    return pools[db_name]
+
+
+async def close_async_pools():
+    """Close every shared pool of the running loop."""
+    pools = _pools.pop(asyncio.get_running_loop(), {})
+    keeper = pools.pop(None, None)
+    for pool in pools.values():
+        await pool.close()
+    if keeper is not None and keeper is not asyncio.current_task():
+        keeper.cancel()
+
+
+class QueryGuard:
+    """Deadline and cancellation handling for statements on one connection.
+
+    A progress handler aborts the running statement once the deadline passes.
+    Cancelling the awaiting task interrupts the statement instead of leaving
+    it running on the connection's worker thread.
+    """
+
+    def __init__(self, connection, timeout=None):
+        self.connection = connection
+        self.timeout = timeout
+        self.deadline = None if timeout is None else time.monotonic() + timeout
+        self.aborted = False
+
+    def expired(self):
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def _check(self):
+        return 1 if self.aborted or self.expired() else 0
+
+    async def install(self):
+        if self.deadline is not None:
+            await self.connection.set_progress_handler(self._check, 1000)
+
+    async def remove(self):
+        if self.deadline is not None:
+            await self.connection.set_progress_handler(None, 0)
+
+    def translate(self, error):
+        """QueryTimeoutError for an error caused by the deadline, else None."""
+        if is_interrupted(error) and self.expired():
+            return QueryTimeoutError(f"Query exceeded its {self.timeout}s deadline")
+        return None
+
+    async def run(self, awaitable):
+        """Await one connection call under the deadline."""
+        task = asyncio.ensure_future(awaitable)
+        try:
+            # Shielded so a cancel reaches us while the statement is still running
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done():
+                self.aborted = True
+                await self.connection.interrupt()
+                try:
+                    await task
+                except (sqlite3.Error, asyncio.CancelledError):
+                    pass
+            raise
+        except sqlite3.OperationalError as e:
+            timeout_error = self.translate(e)
+            if timeout_error is not None:
+                raise timeout_error from e
+            raise
+
+
+# Connection checked out by the current task, per database
+_active = contextvars.ContextVar("active_connections", default={})
+
+
+class AsyncDatabaseConnection:
+    """Async context manager counterpart of DatabaseConnection.
+
+    Connections come from the shared async pool. A nested block for the
+    same database in the same task reuses the connection inside a savepoint.
+
+    With timeout, statements still running that many seconds after the block
+    was entered are interrupted and the block raises QueryTimeoutError. A
+    block cancelled mid-statement interrupts it before rolling back.
+    """
+
+    def __init__(self, db_name="example.db", timeout=None, tracer=None):
+        self.db_name = db_name
+        self.timeout = timeout
+        self.tracer = tracer or default_tracer
+        self.connection = None
+        self._savepoint = None
+        self._token = None
+        self._guard = None
+
+    async def __aenter__(self):
+        """Enter the context and return the database connection."""
+        active = _active.get()
+        if self.db_name in active:
+            self.connection, depth = active[self.db_name]
+            self._savepoint = f"sp_{depth}"
+            # A savepoint outside a transaction would commit on release
+            if not self.connection.in_transaction:
+                await self.connection.execute("BEGIN")
+            await self.connection.execute(f"SAVEPOINT {self._savepoint}")
+        else:
+            with self.tracer.span("connect", self.db_name):
+                self.connection, depth = await get_async_pool(self.db_name).acquire(), 0
+        # Copied rather than mutated so sibling tasks never see each other's connection
+        self._token = _active.set({**active, self.db_name: (self.connection, depth + 1)})
+        if self.timeout is not None:
+            self._guard = QueryGuard(self.connection, self.timeout)
+            await self._guard.install()
+        return self.connection
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        """Exit the context and hand the connection back to the pool."""
+        _active.reset(self._token)
+        timeout_error = None
+        if exc_type is not None and issubclass(exc_type, asyncio.CancelledError):
+            # The cancelled statement may still be running on the worker thread.
+            # Interrupt it before anything else is queued behind it.
+            if self._guard is not None:
+                self._guard.aborted = True
+            await self.connection.interrupt()
+        if self._guard is not None:
+            # Removed before the cleanup statements below so they are not interrupted
+            await self._guard.remove()
+            timeout_error = self._guard.translate(exc_value)
+
+        if self._savepoint is not None:
+            if exc_type is not None:
+                await self.connection.execute(f"ROLLBACK TO SAVEPOINT {self._savepoint}")
+            await self.connection.execute(f"RELEASE SAVEPOINT {self._savepoint}")
+        else:
+            try:
+                if exc_type is None:
+                    with self.tracer.span("commit", self.db_name):
+                        await self.connection.commit()
+                else:
+                    with self.tracer.span("rollback", self.db_name):
+                        await self.connection.rollback()
+            finally:
+                await get_async_pool(self.db_name).release(self.connection)
+
+        if timeout_error is not None:
+            raise timeout_error from exc_value
+        return False
+
+
+class AsyncStreamingResult:
+    """Lazy async iterator over a cursor, pulling rows in fetchmany chunks."""
+
+    def __init__(self, cursor, chunk_size, guard=None, span=None):
+        self.cursor = cursor
+        self.chunk_size = chunk_size
+        self.guard = guard
+        # Starts a fetch span per chunk when given
+        self.span = span
+        self.closed = False
+
+    async def _fetch(self):
+        if self.guard is not None:
+            return await self.guard.run(self.cursor.fetchmany(self.chunk_size))
+        return await self.cursor.fetchmany(self.chunk_size)
+
+    async def __aiter__(self):
+        while True:
+            if self.closed:
+                raise sqlite3.ProgrammingError("Result stream used after the with block exited")
+            if self.span is not None:
+                with self.span() as span:
+                    rows = await self._fetch()
+                    span.attributes["rows"] = len(rows)
+            else:
+                rows = await self._fetch()
+            if not rows:
+                return
+            for row in rows:
+                yield row
+
+    async def close(self):
+        self.closed = True
+        await self.cursor.close()
+
+
+class AsyncExecuteQuery:
+    """Async context manager counterpart of ExecuteQuery.
+
+    Returns the fetched rows, or with stream=True an object to use with
+    ``async for`` that fetches chunk_size rows at a time. timeout bounds
+    execution and fetching as in AsyncDatabaseConnection. Each phase is
+    recorded as a span on tracer, as in ExecuteQuery.
+    """
+
+    def __init__(self, db_name, query, params=None, stream=False, chunk_size=500, timeout=None,
+                 tracer=None):
+        self.db_name = db_name
+        self.query = query
+        self.params = params or ()
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.tracer = tracer or default_tracer
+        self.connection = None
+        self.results = None
+
+    def _span(self, phase):
+        return self.tracer.span(phase, self.db_name, self.query)
+
+    async def __aenter__(self):
+        """Enter the context, execute query, and return results."""
+        pool = get_async_pool(self.db_name)
+        with self._span("connect"):
+            self.connection = await pool.acquire()
+        guard = QueryGuard(self.connection, self.timeout)
+        try:
+            await guard.install()
+            with self._span("execute"):
+                cursor = await guard.run(self.connection.execute(self.query, self.params))
+            if self.stream:
+                self.results = AsyncStreamingResult(cursor, self.chunk_size, guard,
+                                                    lambda: self._span("fetch"))
+            else:
+                with self._span("fetch") as span:
+                    self.results = await guard.run(cursor.fetchall())
+                    span.attributes["rows"] = len(self.results)
+        except BaseException:
+            # __aexit__ does not run when __aenter__ fails
+            await pool.release(self.connection)
+            raise
+        return self.results
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        """Exit the context and hand the connection back to the pool."""
+        try:
+            if isinstance(self.results, AsyncStreamingResult):
+                await self.results.close()
+            if exc_type is None:
+                with self._span("commit"):
+                    await self.connection.commit()
+            else:
+                with self._span("rollback"):
+                    await self.connection.rollback()
+        finally:
+            await get_async_pool(self.db_name).release(self.connection)
+        return False
+
+
+class QueryResult:
+    """Rows returned by one executor query, with its timings in seconds."""
+
+    __slots__ = ("query", "params", "rows", "wait_time", "execution_time", "shared_scan")
+
+    def __init__(self, query, params, rows, wait_time, execution_time, shared_scan=False):
+        self.query = query
+        self.params = params
+        self.rows = rows
+        self.wait_time = wait_time
+        self.execution_time = execution_time
+        self.shared_scan = shared_scan
+
+    def __repr__(self):
+        shared = ", shared scan" if self.shared_scan else ""
+        return (f"QueryResult({self.query!r}, rows={len(self.rows)}, "
+                f"wait={self.wait_time:.6f}s, execution={self.execution_time:.6f}s{shared})")
+
+
+# Only "SELECT * FROM table [WHERE col op value AND ...]" is split in Python;
+# anything else runs as its own query
+_SIMPLE_SELECT = re.compile(r"^\s*SELECT\s+\*\s+FROM\s+(\w+)(?:\s+WHERE\s+(.+?))?\s*;?\s*$",
+                            re.IGNORECASE | re.DOTALL)
+_CONDITION = re.compile(r"^\s*(\w+)\s*(==|=|!=|<>|<=|>=|<|>)\s*(\?|-?\d+(?:\.\d+)?|'(?:[^']|'')*')\s*$")
+_AND = re.compile(r"\s+AND\s+", re.IGNORECASE)
+_OPERATORS = {
+    "=": operator.eq, "==": operator.eq, "!=": operator.ne, "<>": operator.ne,
+    "<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge,
+}
+
+
+def parse_simple_select(query, params):
+    """Return (table, [(column, op, value), ...]) or None if not splittable."""
+    match = _SIMPLE_SELECT.match(query)
+    if not match:
+        return None
+    table, where = match.group(1), match.group(2)
+    predicates = []
+    params = list(params)
+    if where:
+        for clause in _AND.split(where):
+            condition = _CONDITION.match(clause)
+            if not condition:
+                return None
+            column, op, value = condition.groups()
+            if value == "?":
+                if not params:
+                    return None
+                value = params.pop(0)
+            elif value.startswith("'"):
+                value = value[1:-1].replace("''", "'")
+            else:
+                value = float(value) if "." in value else int(value)
+            predicates.append((column.lower(), _OPERATORS[op], value))
+    if params:
+        return None
+    return table.lower(), predicates
+
+
+def _affinity(declared_type):
+    """SQLite's column affinity for a declared type (section 3.1 of datatype3)."""
+    declared = declared_type.upper()
+    if "INT" in declared:
+        return "integer"
+    if "CHAR" in declared or "CLOB" in declared or "TEXT" in declared:
+        return "text"
+    if not declared or "BLOB" in declared:
+        return "blob"
+    if "REAL" in declared or "FLOA" in declared or "DOUB" in declared:
+        return "real"
+    return "numeric"
+
+
+def _value_kind(value):
+    if isinstance(value, (int, float)):
+        return "number"
+    if isinstance(value, str):
+        return "text"
+    return None
+
+
+# Affinities whose comparisons Python reproduces for values of one kind
+_AFFINITY_KINDS = {"integer": "number", "real": "number", "numeric": "number", "text": "text"}
+
+
+def _filterable(predicates, affinities):
+    """Whether Python comparisons give SQLite's answer for these predicates.
+
+    Columns must be declared (so not rowid or its aliases unless declared),
+    and each parameter must already have the type the column's affinity
+    would coerce it to; otherwise the query has to run in SQL.
+    """
+    for column, _, value in predicates:
+        affinity = affinities.get(column)
+        if affinity not in _AFFINITY_KINDS or _value_kind(value) != _AFFINITY_KINDS[affinity]:
+            return False
+    return True
+
+
+def _matches(row, columns, predicates):
+    """True/False, or None when a cell's type would need SQLite's rules."""
+    for column, compare, value in predicates:
+        cell = row[columns[column]]
+        # SQL comparisons with NULL are never true
+        if cell is None:
+            return False
+        if _value_kind(cell) != _value_kind(value):
+            return None
+        if not compare(cell, value):
+            return False
+    return True
+
+
+class AsyncQueryExecutor:
+    """Runs batches of queries over a fixed-size pool with bounded concurrency.
+
+    Unlike gathering coroutines that each open their own connection (and
+    aiosqlite worker thread), at most pool_size connections ever exist and
+    at most max_concurrency queries are in flight. timeout is the default
+    per-query deadline; queries past it raise QueryTimeoutError. Connect,
+    execute and fetch spans go to tracer.
+    """
+
+    def __init__(self, db_name="example.db", pool_size=4, max_concurrency=None, timeout=None,
+                 tracer=None):
+        self.db_name = db_name
+        self.pool_size = pool_size
+        self.max_concurrency = max_concurrency or pool_size
+        self.timeout = timeout
+        self.tracer = tracer or default_tracer
+        self._pool = None
+        self._semaphore = None
+        self.scans_saved = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+        return False
+
+    def _ensure_started(self):
+        # Created lazily so they bind to the loop the executor is used on
+        if self._pool is None:
+            self._pool = AsyncConnectionPool(self.db_name, self.pool_size)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def execute(self, query, params=(), with_columns=False, timeout=None):
+        """Run one query and return its QueryResult.
+
+        with_columns makes rows a (column index map, rows) pair for shared scans.
+        The deadline covers the query itself, not time spent waiting for a slot.
+        """
+        self._ensure_started()
+        queued = time.perf_counter()
+        async with self._semaphore:
+            with self.tracer.span("connect", self.db_name, query):
+                connection = await self._pool.acquire()
+            started = time.perf_counter()
+            guard = QueryGuard(connection, self.timeout if timeout is None else timeout)
+            try:
+                await guard.install()
+                with self.tracer.span("execute", self.db_name, query):
+                    cursor = await guard.run(connection.execute(query, params))
+                with self.tracer.span("fetch", self.db_name, query) as span:
+                    rows = await guard.run(cursor.fetchall())
+                    span.attributes["rows"] = len(rows)
+                if with_columns:
+                    columns = {d[0].lower(): i for i, d in enumerate(cursor.description)}
+                    rows = (columns, rows)
+                await cursor.close()
+            finally:
+                await self._pool.release(connection)
+        return QueryResult(query, params, rows, started - queued, time.perf_counter() - started)
+
+    async def _column_affinities(self, table):
+        """{column: affinity} for table, or {} if its comparisons use collations."""
+        schema = await self.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?",
+                                    (table,))
+        if not schema.rows or "COLLATE" in (schema.rows[0][0] or "").upper():
+            return {}
+        info = await self.execute(f"PRAGMA table_info({table})")
+        return {row[1].lower(): _affinity(row[2] or "") for row in info.rows}
+
+    async def run_batch(self, queries, shared_scan=False):
+        """Run (query, params) pairs concurrently; results keep the input order.
+
+        With shared_scan, when the batch already scans a whole table with
+        "SELECT * FROM table", simple filtered SELECTs on that table are
+        answered from the same rows in Python. A filter falls back to SQL
+        whenever Python could disagree with SQLite: undeclared columns such as
+        rowid, parameters whose type differs from the column's affinity,
+        cells of another type, or columns with a collation.
+        """
+        normalized = [(q, ()) if isinstance(q, str) else (q[0], tuple(q[1])) for q in queries]
+        results = [None] * len(normalized)
+        groups = {}
+        if shared_scan:
+            parsed = {}
+            for index, (query, params) in enumerate(normalized):
+                select = parse_simple_select(query, params)
+                if select is not None:
+                    parsed[index] = select
+            # Only piggyback on a full scan the batch is running anyway, so
+            # indexed point lookups are never turned into table scans
+            full_scans = {table for table, predicates in parsed.values() if not predicates}
+            for index, (table, predicates) in parsed.items():
+                if table in full_scans:
+                    groups.setdefault(table, []).append((index, predicates))
+        groups = {table: members for table, members in groups.items() if len(members) > 1}
+        shared = {index for members in groups.values() for index, _ in members}
+
+        async def run_single(index):
+            results[index] = await self.execute(*normalized[index])
+
+        async def run_shared(table, members):
+            affinities = await self._column_affinities(table)
+            scan = await self.execute(f"SELECT * FROM {table}", (), with_columns=True)
+            columns, rows = scan.rows
+            fallbacks = []
+            for index, predicates in members:
+                started = time.perf_counter()
+                selected = None
+                if _filterable(predicates, affinities):
+                    selected = []
+                    for row in rows:
+                        matched = _matches(row, columns, predicates)
+                        if matched is None:
+                            selected = None
+                            break
+                        if matched:
+                            selected.append(row)
+                if selected is None:
+                    fallbacks.append(index)
+                    continue
+                results[index] = QueryResult(
+                    normalized[index][0], normalized[index][1], selected, scan.wait_time,
+                    scan.execution_time + time.perf_counter() - started, shared_scan=True
+                )
+            self.scans_saved += len(members) - len(fallbacks) - 1
+            await asyncio.gather(*(run_single(index) for index in fallbacks))
+
+        await asyncio.gather(
+            *(run_shared(table, members) for table, members in groups.items()),
+            *(run_single(index) for index in range(len(normalized)) if index not in shared)
+        )
+        return results
+
+    async def close(self):
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+            self._semaphore = None
+
+
+def encode_batch(rows):
+    """Turn rows into columns; int/float columns become compact arrays.
+
+    An array pickles as one buffer, so shipping a batch to another process
+    does not pickle every value of those columns separately.
+    """
+    columns = []
+    for column in zip(*rows):
+        kinds = {type(value) for value in column}
+        try:
+            if kinds == {int}:
+                column = array("q", column)
+            elif kinds == {float}:
+                column = array("d", column)
+            else:
+                column = list(column)
+        except OverflowError:
+            column = list(column)
+        columns.append(column)
+    return columns
+
+
+def encode_batches(rows, batch_size):
+    """Materialize rows and encode them batch_size at a time."""
+    rows = list(rows)
+    return [encode_batch(rows[start:start + batch_size]) for start in range(0, len(rows), batch_size)]
+
+
+def decode_batch(columns):
+    """Inverse of encode_batch."""
+    return list(zip(*columns))
+
+
+def _run_transform(fn, columns, columnar):
+    # Runs in the worker process
+    return fn(columns if columnar else decode_batch(columns))
+
+
+class ResultProcessPool:
+    """Offloads CPU-heavy transforms of query results to worker processes.
+
+    Rows are split into batches of batch_size and encoded column-wise on a
+    worker thread, then sent to a ProcessPoolExecutor, so the event loop
+    only awaits the outputs.
+    fn must be a module-level function so it can be pickled; with
+    columnar=True it receives the list of columns instead of rows.
+    """
+
+    def __init__(self, max_workers=None, batch_size=10000):
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+        self._executor = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+        return False
+
+    async def map_batches(self, fn, rows, columnar=False):
+        """Apply fn to each batch in a worker process; outputs keep batch order."""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        loop = asyncio.get_running_loop()
+        batches = await loop.run_in_executor(None, encode_batches, rows, self.batch_size)
+        futures = [
+            loop.run_in_executor(self._executor, _run_transform, fn, batch, columnar)
+            for batch in batches
+        ]
+        return list(await asyncio.gather(*futures))
+
+    async def transform(self, fn, rows, combine, columnar=False):
+        """Like map_batches, then merge the per-batch outputs with combine."""
+        return combine(await self.map_batches(fn, rows, columnar))
+
+    async def close(self):
+        """Shut the worker processes down without blocking the event loop."""
+        if self._executor is not None:
+            executor, self._executor = self._executor, None
+            await asyncio.get_running_loop().run_in_executor(None, executor.shutdown)
+
+
+def count_by_decade(columns):
+    """Example CPU-bound transform: number of users per age decade."""
+    counts = {}
+    for age in columns[2]:
+        if age is not None:
+            decade = age // 10 * 10
+            counts[decade] = counts.get(decade, 0) + 1
+    return counts
+
+
+def merge_counts(partials):
+    totals = {}
+    for partial in partials:
+        for key, count in partial.items():
+            totals[key] = totals.get(key, 0) + count
+    return dict(sorted(totals.items()))
+
 
 async def async_fetch_users():
     """Asynchronously fetch all users from the database."""
@@ -17,21 +713,75 @@ async def async_fetch_older_users():
         return results
 
 async def fetch_concurrently():
-    """Execute both queries concurrently using asyncio.gather."""
-    # Run both queries concurrently
-    all_users, older_users = await asyncio.gather(
-        async_fetch_users(),
-        async_fetch_older_users()
-    )
+    """Execute both queries concurrently through a bounded executor."""
+    async with AsyncQueryExecutor("example.db", pool_size=2) as executor:
+        all_users, older_users = await executor.run_batch([
+            "SELECT * FROM users",
+            ("SELECT * FROM users WHERE age > ?", (40,)),
+        ], shared_scan=True)
     
     print("All users:")
-    for row in all_users:
+    for row in all_users.rows:
         print(f"ID: {row[0]}, Name: {row[1]}, Age: {row[2]}")
     
     print("\nUsers older than 40:")
-    for row in older_users:
+    for row in older_users.rows:
         print(f"ID: {row[0]}, Name: {row[1]}, Age: {row[2]}")
 
+    print("\nTimings (both views come from one scan of users):")
+    for result in (all_users, older_users):
+        print(f"  {result}")
+
+async def fetch_with_context_managers():
+    """Same queries through the pooled async context managers."""
+    tracer = Tracer(InMemoryExporter())
+    async with AsyncExecuteQuery("example.db", "SELECT * FROM users WHERE age > ?", (40,),
+                                 tracer=tracer) as rows:
+        print(f"\nUsers older than 40 (AsyncExecuteQuery): {len(rows)}")
+    for span in tracer.exporter.spans:
+        print(f"  {span.phase:<8} {span.duration:.6f}s")
+
+    print("Streaming all users:")
+    async with AsyncExecuteQuery("example.db", "SELECT * FROM users", stream=True, chunk_size=2) as rows:
+        async for row in rows:
+            print(f"ID: {row[0]}, Name: {row[1]}, Age: {row[2]}")
+
+    async with AsyncDatabaseConnection("example.db") as db:
+        await db.execute("UPDATE users SET age = age WHERE id = 1")
+
+    await close_async_pools()
+
+async def stop_runaway_queries():
+    """A query past its deadline, and one whose task is cancelled."""
+    runaway = """
+        WITH RECURSIVE counter(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM counter)
+        SELECT COUNT(*) FROM counter
+    """
+    async with AsyncQueryExecutor("example.db", pool_size=1, timeout=0.5) as executor:
+        try:
+            await executor.execute(runaway)
+        except QueryTimeoutError as e:
+            print(f"\nRunaway query stopped: {e}")
+
+        task = asyncio.ensure_future(executor.execute(runaway, timeout=60))
+        await asyncio.sleep(0.2)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            print("Cancelled query interrupted")
+
+        # The single pooled connection is free again
+        result = await executor.execute("SELECT COUNT(*) FROM users")
+        print(f"Connection reused afterwards: {result.rows}")
+
+async def summarize_in_worker_processes():
+    """Aggregate the users table off the event loop."""
+    rows = await async_fetch_users()
+    async with ResultProcessPool(max_workers=2, batch_size=2) as pool:
+        by_decade = await pool.transform(count_by_decade, rows, merge_counts, columnar=True)
+    print(f"\nUsers per age decade (computed in worker processes): {by_decade}")
+
 # Setup function to create sample data
 def setup_database():
     """Create sample database with users table."""
@@ -53,4 +803,7 @@ if __name__ == "__main__":
     setup_database()
     
     # Run the concurrent fetch
-    asyncio.run(fetch_concurrently())
\ No newline at end of file
+    asyncio.run(fetch_concurrently())
+    asyncio.run(fetch_with_context_managers())
+    asyncio.run(stop_runaway_queries())
+    asyncio.run(summarize_in_worker_processes())
\ No newline at end of file
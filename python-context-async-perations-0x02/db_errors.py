@@ -0,0 +1,18 @@
+"""Exceptions shared by the database context managers in this directory."""
+import sqlite3
+
+
+class QueryTimeoutError(sqlite3.OperationalError):
+    """Raised when a statement was interrupted because its deadline passed."""
+
+
+class PoolTimeoutError(sqlite3.OperationalError):
+    """Raised when no pooled connection became free within the pool's timeout."""
+
+
+def is_interrupted(error):
+    """Whether error is SQLite reporting a statement stopped by interrupt()
+    or a progress handler, as opposed to any other OperationalError."""
+    return (isinstance(error, sqlite3.OperationalError)
+            and not isinstance(error, QueryTimeoutError)
+            and str(error) == "interrupted")
@@ -0,0 +1,218 @@
+"""Timing spans and latency histograms for the database context managers.
+
+Each phase of a block (connect, execute, fetch, commit or rollback) is timed
+as a span. Spans are aggregated into per-query-fingerprint histograms and
+handed to an exporter:
+
+    from db_tracing import InMemoryExporter, default_tracer
+
+    default_tracer.exporter = InMemoryExporter()
+    with ExecuteQuery("example.db", "SELECT * FROM users") as rows:
+        ...
+    print(default_tracer.summary())
+"""
+import bisect
+import json
+import logging
+import re
+import threading
+import time
+
+# Upper bounds in seconds; the last bucket catches everything slower
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint_query(query):
+    """Normalize literals and whitespace so similar queries share a histogram."""
+    if query is None:
+        return None
+    fingerprint = _STRING_LITERAL.sub("?", query)
+    fingerprint = _NUMBER_LITERAL.sub("?", fingerprint)
+    return _WHITESPACE.sub(" ", fingerprint).strip().lower()
+
+
+class Span:
+    """One timed phase; also the context manager that times it."""
+
+    __slots__ = ("tracer", "phase", "db_name", "fingerprint", "start", "duration", "error", "attributes")
+
+    def __init__(self, tracer, phase, db_name=None, query=None, **attributes):
+        self.tracer = tracer
+        self.phase = phase
+        self.db_name = db_name
+        self.fingerprint = fingerprint_query(query)
+        self.start = None
+        self.duration = None
+        self.error = None
+        self.attributes = attributes
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.duration = time.perf_counter() - self.start
+        if exc_type is not None:
+            self.error = exc_type.__name__
+        self.tracer.finish(self)
+        return False
+
+    def to_dict(self):
+        return {
+            "phase": self.phase,
+            "db": self.db_name,
+            "fingerprint": self.fingerprint,
+            "duration": self.duration,
+            "error": self.error,
+            **self.attributes,
+        }
+
+    def __repr__(self):
+        return f"Span({self.phase!r}, {self.fingerprint!r}, duration={self.duration})"
+
+
+class Histogram:
+    """Fixed-bucket latency histogram."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.bounds = tuple(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.max
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "total": self.total,
+            "avg": self.total / self.count if self.count else 0.0,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+            "buckets": dict(zip([*map(str, self.bounds), "inf"], self.counts)),
+        }
+
+
+class SpanExporter:
+    """Receives every finished span. Subclasses override export."""
+
+    def export(self, span):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class LogExporter(SpanExporter):
+    """Logs one line per span."""
+
+    def __init__(self, logger=None, level=logging.DEBUG):
+        self.logger = logger or logging.getLogger("db_tracing")
+        self.level = level
+
+    def export(self, span):
+        status = f" ({span.error})" if span.error else ""
+        self.logger.log(self.level, "%s %.6fs %s%s", span.phase, span.duration,
+                        span.fingerprint or span.db_name, status)
+
+
+class JSONFileExporter(SpanExporter):
+    """Appends spans to a file as JSON lines."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+
+    def export(self, span):
+        line = json.dumps(span.to_dict())
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a")
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class InMemoryExporter(SpanExporter):
+    """Keeps spans in a list, for tests and interactive inspection."""
+
+    def __init__(self):
+        self.spans = []
+
+    def export(self, span):
+        self.spans.append(span)
+
+    def clear(self):
+        self.spans.clear()
+
+
+class Tracer:
+    """Creates spans and aggregates their durations per fingerprint and phase."""
+
+    def __init__(self, exporter=None, buckets=DEFAULT_BUCKETS):
+        self.exporter = exporter
+        self.buckets = buckets
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def span(self, phase, db_name=None, query=None, **attributes):
+        return Span(self, phase, db_name, query, **attributes)
+
+    def finish(self, span):
+        # Connection-level spans have no query and are grouped by database
+        key = (span.fingerprint or span.db_name, span.phase)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(self.buckets)
+            histogram.record(span.duration)
+        if self.exporter is not None:
+            self.exporter.export(span)
+
+    def summary(self):
+        """Histogram snapshots as {fingerprint or database: {phase: stats}}."""
+        with self._lock:
+            items = [(key, histogram.snapshot()) for key, histogram in self.histograms.items()]
+        summary = {}
+        for (name, phase), snapshot in items:
+            summary.setdefault(name, {})[phase] = snapshot
+        return summary
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+
+
+# Used by the context managers unless they are given their own tracer
+default_tracer = Tracer()
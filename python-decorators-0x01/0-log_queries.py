@@ -1,26 +1,43 @@
 import sqlite3
+import asyncio
 import functools
 from datetime import datetime
 
+try:
+    import aiosqlite
+except ImportError:  # only needed by the async example
+    aiosqlite = None
+
 #### decorator to log SQL queries
 
+def _log_query(args, kwargs):
+    if args:
+        query = args[0] if isinstance(args[0], str) else None
+    elif 'query' in kwargs:
+        query = kwargs['query']
+    else:
+        query = None
+
+    if query:
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        print(f"[{timestamp}] Executing SQL Query: {query}")
+    else:
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        print(f"[{timestamp}] No SQL query found to log")
+
+
 def log_queries(func):
+    if asyncio.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            _log_query(args, kwargs)
+            return await func(*args, **kwargs)
+
+        return async_wrapper
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        if args:
-            query = args[0] if isinstance(args[0], str) else None
-        elif 'query' in kwargs:
-            query = kwargs['query']
-        else:
-            query = None
-        
-        if query:
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            print(f"[{timestamp}] Executing SQL Query: {query}")
-        else:
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            print(f"[{timestamp}] No SQL query found to log")
-        
+        _log_query(args, kwargs)
         return func(*args, **kwargs)
     
     return wrapper
@@ -34,5 +51,16 @@ def fetch_all_users(query):
     conn.close()
     return results
 
-#### fetch users while logging the query
-users = fetch_all_users(query="SELECT * FROM users")
\ No newline at end of file
+@log_queries
+async def async_fetch_all_users(query):
+    async with aiosqlite.connect('users.db') as conn:
+        cursor = await conn.execute(query)
+        return await cursor.fetchall()
+
+if __name__ == "__main__":
+    #### fetch users while logging the query
+    users = fetch_all_users(query="SELECT * FROM users")
+
+    #### same decorator on a coroutine function
+    if aiosqlite is not None:
+        users = asyncio.run(async_fetch_all_users(query="SELECT * FROM users"))
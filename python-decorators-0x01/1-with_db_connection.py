@@ -1,10 +1,25 @@
 import sqlite3 
+import asyncio
 import functools
 from typing import Callable, Any
 
+try:
+    import aiosqlite
+except ImportError:  # only needed for coroutine functions
+    aiosqlite = None
+
 
 def with_db_connection(func: Callable) -> Callable:
     
+    if asyncio.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            # Keep the connection open until the coroutine has finished
+            async with aiosqlite.connect('users.db') as conn:
+                return await func(conn, *args, **kwargs)
+
+        return async_wrapper
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         conn = sqlite3.connect('users.db')
@@ -25,6 +40,12 @@ def get_user_by_id(conn, user_id):
     return cursor.fetchone() 
 
 
+@with_db_connection
+async def async_get_user_by_id(conn, user_id):
+    cursor = await conn.execute("SELECT * FROM users WHERE id = ?", (user_id,))
+    return await cursor.fetchone()
+
+
 if __name__ == "__main__":
     conn = sqlite3.connect('users.db')
     cursor = conn.cursor()
@@ -44,4 +65,8 @@ if __name__ == "__main__":
     
 
     user = get_user_by_id(user_id=1)
-    print(user)
\ No newline at end of file
+    print(user)
+
+    if aiosqlite is not None:
+        user = asyncio.run(async_get_user_by_id(user_id=1))
+        print(user)
\ No newline at end of file
@@ -1,14 +1,156 @@
-import sqlite3 
+import sqlite3
+import asyncio
+import contextvars
 import functools
-from typing import Callable, Any
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Any, Dict, Iterator, List, Optional
+
+try:
+    import aiosqlite
+except ImportError:  # only needed for coroutine functions
+    aiosqlite = None
+
+
+class PoolTimeoutError(sqlite3.OperationalError):
+    """Raised when every reader connection stayed busy for the router's timeout."""
+
+
+class ConnectionRouter:
+    """Sends readers to pooled read-only connections and writers to one writer.
+
+    The database is switched to WAL mode first, so readers never block the
+    writer and the writer never blocks readers. Only synchronous functions
+    are routed; coroutines open their own aiosqlite connection per call and
+    are neither pooled nor serialized with the writer.
+    """
+
+    def __init__(self, db_name: str = 'users.db', max_readers: int = 4, timeout: float = 5.0):
+        self.db_name = db_name
+        self.max_readers = max_readers
+        self.timeout = timeout
+        self._readers: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._reader_count = 0
+        self._lock = threading.Lock()
+        self._writer: Optional[sqlite3.Connection] = None
+        # Reentrant so nested writers on one thread share the connection
+        self._writer_lock = threading.RLock()
+        self._writer_depth = 0
+
+    @property
+    def reader_uri(self) -> str:
+        return f"file:{self.db_name}?mode=ro"
+
+    def _writer_connection(self) -> sqlite3.Connection:
+        with self._lock:
+            if self._writer is None:
+                conn = sqlite3.connect(self.db_name, timeout=self.timeout, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                self._writer = conn
+            return self._writer
+
+    def _borrow_reader(self) -> sqlite3.Connection:
+        try:
+            return self._readers.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            create = self._reader_count < self.max_readers
+            if create:
+                self._reader_count += 1
+        if not create:
+            try:
+                return self._readers.get(timeout=self.timeout)
+            except queue.Empty:
+                raise PoolTimeoutError(
+                    f"All {self.max_readers} readers of {self.db_name} stayed busy for {self.timeout}s"
+                ) from None
+        # Read-only connections cannot switch journal mode, so let the writer do it
+        self._writer_connection()
+        return sqlite3.connect(self.reader_uri, uri=True, timeout=self.timeout,
+                               check_same_thread=False)
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        conn = self._borrow_reader()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._readers.put(conn)
+
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Connection]:
+        with self._writer_lock:
+            conn = self._writer_connection()
+            self._writer_depth += 1
+            try:
+                yield conn
+            finally:
+                self._writer_depth -= 1
+                # Whatever the outermost writer left open would otherwise be
+                # committed by the next, unrelated one
+                if not self._writer_depth and conn.in_transaction:
+                    conn.rollback()
+
+
+router = ConnectionRouter('users.db')
+
+
+def db_reader(func: Callable) -> Callable:
+    """Mark func as read-only so with_db_connection routes it to a reader."""
+    func._db_role = "read"
+    return func
+
+
+def db_writer(func: Callable) -> Callable:
+    """Mark func as writing so with_db_connection routes it to the writer."""
+    func._db_role = "write"
+    return func
+
 
 def with_db_connection(func: Callable) -> Callable:
-    
+
+    role = getattr(func, "_db_role", None)
+
+    if asyncio.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            # Keep the connection open until the coroutine has finished; the
+            # router's pool and writer lock do not cover coroutines
+            if role == "read":
+                connection = aiosqlite.connect(router.reader_uri, uri=True)
+            else:
+                connection = aiosqlite.connect(router.db_name)
+            async with connection as conn:
+                return await func(conn, *args, **kwargs)
+
+        return async_wrapper
+
+    if role == "read":
+        @functools.wraps(func)
+        def read_wrapper(*args, **kwargs):
+            with router.reader() as conn:
+                return func(conn, *args, **kwargs)
+
+        return read_wrapper
+
+    if role == "write":
+        @functools.wraps(func)
+        def write_wrapper(*args, **kwargs):
+            with router.writer() as conn:
+                return func(conn, *args, **kwargs)
+
+        return write_wrapper
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         # Open a database connection
         conn = sqlite3.connect('users.db')
-        
+
         try:
             # Pass the connection as the first argument
             result = func(conn, *args, **kwargs)
@@ -16,41 +158,304 @@ def with_db_connection(func: Callable) -> Callable:
         finally:
             # Ensure the connection is closed even if an exception occurs
             conn.close()
-    
+
     return wrapper
 
 
-def transactional(func: Callable) -> Callable:
-    
+class GroupCommitConnection(sqlite3.Connection):
+    """A connection that carries its own GroupCommitter.
+
+    Plain sqlite3 connections take neither attributes nor weak references, so
+    group commits need connections opened with this factory.
+    """
+
+    _group_committer: Optional["GroupCommitter"] = None
+
+    def close(self) -> None:
+        self._group_committer = None
+        super().close()
+
+
+# One long-lived connection per database file, shared by every thread
+_pooled_connections: Dict[str, sqlite3.Connection] = {}
+_pool_lock = threading.Lock()
+
+
+def get_pooled_connection(db_name: str = 'users.db') -> sqlite3.Connection:
+    with _pool_lock:
+        if db_name not in _pooled_connections:
+            _pooled_connections[db_name] = sqlite3.connect(db_name, check_same_thread=False,
+                                                           factory=GroupCommitConnection)
+        return _pooled_connections[db_name]
+
+
+def with_pooled_connection(func: Callable) -> Callable:
+
     @functools.wraps(func)
-    def wrapper(conn, *args, **kwargs):
-        try:
-            # Execute the function within a transaction
-            result = func(conn, *args, **kwargs)
-            
-            # If no exception occurs, commit the transaction
-            conn.commit()
-            return result
-        except Exception as e:
-            # If an exception occurs, roll back the transaction
-            conn.rollback()
-            # Re-raise the exception to be handled by the caller
-            raise e
-    
+    def wrapper(*args, **kwargs):
+        # The pooled connection stays open so group commits can span calls
+        return func(get_pooled_connection(), *args, **kwargs)
+
     return wrapper
 
 
-@with_db_connection 
-@transactional 
-def update_user_email(conn, user_id, new_email): 
-    cursor = conn.cursor() 
+# Per-thread nesting depth of @transactional calls, keyed by connection id
+_local = threading.local()
+
+
+def _depths() -> Dict[int, int]:
+    if not hasattr(_local, "depths"):
+        _local.depths = {}
+    return _local.depths
+
+
+def _run_in_savepoint(conn, name: str, func: Callable, args, kwargs) -> Any:
+    # Make sure RELEASE never ends up committing the outer transaction
+    if not conn.in_transaction:
+        conn.execute("BEGIN")
+    conn.execute(f"SAVEPOINT {name}")
+    try:
+        result = func(conn, *args, **kwargs)
+    except Exception:
+        conn.execute(f"ROLLBACK TO SAVEPOINT {name}")
+        conn.execute(f"RELEASE SAVEPOINT {name}")
+        raise
+    conn.execute(f"RELEASE SAVEPOINT {name}")
+    return result
+
+
+# Same bookkeeping for coroutines; a context variable follows the task
+_async_depths: contextvars.ContextVar = contextvars.ContextVar("async_depths", default=None)
+
+
+async def _run_in_savepoint_async(conn, name: str, func: Callable, args, kwargs) -> Any:
+    if not conn.in_transaction:
+        await conn.execute("BEGIN")
+    await conn.execute(f"SAVEPOINT {name}")
+    try:
+        result = await func(conn, *args, **kwargs)
+    except Exception:
+        await conn.execute(f"ROLLBACK TO SAVEPOINT {name}")
+        await conn.execute(f"RELEASE SAVEPOINT {name}")
+        raise
+    await conn.execute(f"RELEASE SAVEPOINT {name}")
+    return result
+
+
+class _Ticket:
+    """A finished transaction waiting for the group commit that covers it."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.error: Optional[BaseException] = None
+
+
+class GroupCommitter:
+    """Coalesces transactional calls on one connection into shared commits."""
+
+    def __init__(self, conn, max_batch: int = 100, max_wait: float = 0.005):
+        self.conn = conn
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        # Serializes statements on the shared connection
+        self._conn_lock = threading.RLock()
+        self._cond = threading.Condition()
+        self._pending: List[_Ticket] = []
+        self._active = 0
+        self._has_leader = False
+        self.transactions = 0
+        self.commits = 0
+
+    def run(self, func: Callable, args, kwargs) -> Any:
+        with self._cond:
+            self._active += 1
+        ticket = _Ticket()
+        try:
+            with self._conn_lock:
+                # Each caller gets its own savepoint so a failure only undoes its work
+                try:
+                    result = _run_in_savepoint(self.conn, "txn_0", func, args, kwargs)
+                except Exception:
+                    # With nobody waiting on a commit, end the transaction so
+                    # its write lock is not held open
+                    with self._cond:
+                        if not self._pending:
+                            self.conn.rollback()
+                    raise
+                # Registered under the connection lock so a batch matches
+                # exactly the work contained in the transaction it commits
+                with self._cond:
+                    self._pending.append(ticket)
+                    self.transactions += 1
+                    leader = not self._has_leader
+                    self._has_leader = True
+                    self._cond.notify_all()
+        finally:
+            with self._cond:
+                self._active -= 1
+                self._cond.notify_all()
+
+        if leader:
+            self._lead()
+        ticket.done.wait()
+        if ticket.error is not None:
+            raise ticket.error
+        return result
+
+    def _lead(self) -> None:
+        deadline = time.monotonic() + self.max_wait
+        with self._cond:
+            # Wait for in-flight callers to join, but never longer than max_wait
+            while self._active and len(self._pending) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+        batch: List[_Ticket] = []
+        error = None
+        try:
+            with self._conn_lock:
+                with self._cond:
+                    batch, self._pending = self._pending, []
+                    self._has_leader = False
+                try:
+                    self.conn.commit()
+                    self.commits += 1
+                except Exception as e:
+                    error = e
+                    self.conn.rollback()
+        finally:
+            # Even if the rollback fails, nobody may be left waiting
+            for ticket in batch:
+                ticket.error = error
+                ticket.done.set()
+
+    def flush(self) -> None:
+        """Commit whatever is pending right away."""
+        with self._cond:
+            if self._has_leader or not self._pending:
+                return
+            self._has_leader = True
+        self._lead()
+
+
+_committers_lock = threading.Lock()
+
+
+def get_group_committer(conn, max_batch: int = 100, max_wait: float = 0.005) -> GroupCommitter:
+    # Stored on the connection, so it goes away when the connection is closed
+    if not isinstance(conn, GroupCommitConnection):
+        raise TypeError("group_commit needs a connection opened with factory=GroupCommitConnection")
+    with _committers_lock:
+        if conn._group_committer is None:
+            conn._group_committer = GroupCommitter(conn, max_batch, max_wait)
+        return conn._group_committer
+
+
+def transactional(func: Optional[Callable] = None, *, group_commit: bool = False,
+                  max_batch: int = 100, max_wait: float = 0.005) -> Callable:
+
+    def decorator(func: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(func):
+            if group_commit:
+                raise TypeError("group_commit is only supported for synchronous functions")
+
+            @functools.wraps(func)
+            async def async_wrapper(conn, *args, **kwargs):
+                # Copy rather than mutate so concurrent tasks never share depths
+                depths = _async_depths.get() or {}
+                key = id(conn)
+                depth = depths.get(key, 0)
+                token = _async_depths.set({**depths, key: depth + 1})
+                try:
+                    if depth:
+                        return await _run_in_savepoint_async(conn, f"txn_{depth}", func, args, kwargs)
+                    try:
+                        result = await func(conn, *args, **kwargs)
+                        await conn.commit()
+                        return result
+                    except Exception:
+                        await conn.rollback()
+                        raise
+                finally:
+                    _async_depths.reset(token)
+
+            return db_writer(async_wrapper)
+
+        @functools.wraps(func)
+        def wrapper(conn, *args, **kwargs):
+            depths = _depths()
+            key = id(conn)
+            depth = depths.get(key, 0)
+            depths[key] = depth + 1
+            try:
+                # Nested calls become savepoints inside the outer transaction
+                if depth:
+                    return _run_in_savepoint(conn, f"txn_{depth}", func, args, kwargs)
+
+                if group_commit:
+                    committer = get_group_committer(conn, max_batch, max_wait)
+                    return committer.run(func, args, kwargs)
+
+                try:
+                    # Execute the function within a transaction
+                    result = func(conn, *args, **kwargs)
+
+                    # If no exception occurs, commit the transaction
+                    conn.commit()
+                    return result
+                except Exception as e:
+                    # If an exception occurs, roll back the transaction
+                    conn.rollback()
+                    # Re-raise the exception to be handled by the caller
+                    raise e
+            finally:
+                if depth:
+                    depths[key] = depth
+                else:
+                    depths.pop(key, None)
+
+        # Group commits manage their own shared connection
+        return wrapper if group_commit else db_writer(wrapper)
+
+    if func is None:
+        return decorator
+    return decorator(func)
+
+
+@with_db_connection
+@transactional
+def update_user_email(conn, user_id, new_email):
+    cursor = conn.cursor()
+    cursor.execute("UPDATE users SET email = ? WHERE id = ?", (new_email, user_id))
+
+
+@with_db_connection
+@db_reader
+def get_user_email(conn, user_id):
+    cursor = conn.cursor()
+    cursor.execute("SELECT email FROM users WHERE id = ?", (user_id,))
+    return cursor.fetchone()[0]
+
+
+@with_db_connection
+@transactional
+async def async_update_user_email(conn, user_id, new_email):
+    await conn.execute("UPDATE users SET email = ? WHERE id = ?", (new_email, user_id))
+
+
+@with_pooled_connection
+@transactional(group_commit=True)
+def update_user_email_batched(conn, user_id, new_email):
+    cursor = conn.cursor()
     cursor.execute("UPDATE users SET email = ? WHERE id = ?", (new_email, user_id))
 
 
 if __name__ == "__main__":
     conn = sqlite3.connect('users.db')
     cursor = conn.cursor()
-    
+
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS users (
         id INTEGER PRIMARY KEY,
@@ -58,20 +463,66 @@ if __name__ == "__main__":
         email TEXT NOT NULL
     )
     ''')
-    
-    cursor.execute("INSERT OR IGNORE INTO users (id, name, email) VALUES (?, ?, ?)", 
+
+    cursor.execute("INSERT OR IGNORE INTO users (id, name, email) VALUES (?, ?, ?)",
                   (1, "John Doe", "johndoe@example.com"))
     conn.commit()
-    
+
     cursor.execute("SELECT email FROM users WHERE id = ?", (1,))
     print(f"Current email: {cursor.fetchone()[0]}")
     conn.close()
-    
+
     # Update email with automaticaly
     update_user_email(user_id=1, new_email='Crawford_Cartwright@hotmail.com')
-    
+
     conn = sqlite3.connect('users.db')
     cursor = conn.cursor()
     cursor.execute("SELECT email FROM users WHERE id = ?", (1,))
     print(f"Updated email: {cursor.fetchone()[0]}")
-    conn.close()
\ No newline at end of file
+    conn.close()
+
+    # Concurrent updates coalesced into a handful of commits
+    threads = [
+        threading.Thread(target=update_user_email_batched, args=(1, f"user{i}@example.com"))
+        for i in range(50)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    committer = get_group_committer(get_pooled_connection())
+    print(f"Group commit: {committer.transactions} transactions in {committer.commits} commits")
+
+    # A caller that fails inside a batch only undoes its own savepoint
+    @with_pooled_connection
+    @transactional(group_commit=True)
+    def insert_check_row(conn, row_id):
+        conn.execute("INSERT INTO group_commit_check (id) VALUES (?)", (row_id,))
+        if row_id == 5:
+            raise ValueError("rejected")
+
+    def insert_ignoring_rejection(row_id):
+        try:
+            insert_check_row(row_id)
+        except ValueError:
+            pass
+
+    check = get_pooled_connection()
+    check.execute("CREATE TABLE IF NOT EXISTS group_commit_check (id INTEGER PRIMARY KEY)")
+    check.execute("DELETE FROM group_commit_check")
+    check.commit()
+    threads = [threading.Thread(target=insert_ignoring_rejection, args=(i,)) for i in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    kept = [row[0] for row in check.execute("SELECT id FROM group_commit_check ORDER BY id")]
+    assert kept == [i for i in range(10) if i != 5], kept
+    print(f"Failed caller rolled back alone; kept rows {kept}")
+
+    # Readers run on pooled read-only connections while the writer keeps writing
+    update_user_email(user_id=1, new_email='routed@example.com')
+    print(f"Read through the router: {get_user_email(user_id=1)}")
+
+    if aiosqlite is not None:
+        asyncio.run(async_update_user_email(user_id=1, new_email='async@example.com'))
@@ -1,8 +1,17 @@
 import time
-import sqlite3 
+import random
+import asyncio
+import sqlite3
 import functools
 import logging
-from typing import Callable, Any, Optional
+import threading
+from collections import deque
+from typing import Callable, Any, Optional, Deque, Dict
+
+try:
+    import aiosqlite
+except ImportError:  # only needed for coroutine functions
+    aiosqlite = None
 
 # Conf logging
 logging.basicConfig(
@@ -13,7 +22,16 @@ logger = logging.getLogger(__name__)
 
 
 def with_db_connection(func: Callable) -> Callable:
-    
+
+    if asyncio.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            # Keep the connection open until the coroutine has finished
+            async with aiosqlite.connect('users.db') as conn:
+                return await func(conn, *args, **kwargs)
+
+        return async_wrapper
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         conn = sqlite3.connect('users.db')
@@ -22,37 +40,302 @@ def with_db_connection(func: Callable) -> Callable:
             return result
         finally:
             conn.close()
-    
+
     return wrapper
 
 
-def retry_on_failure(retries: int = 3, delay: int = 2) -> Callable:
-    
+# SQLite messages that describe contention rather than a broken query
+TRANSIENT_SQLITE_MESSAGES = ("database is locked", "database is busy", "database table is locked")
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Return True for errors worth retrying (SQLite lock/busy contention)."""
+    if isinstance(exc, sqlite3.OperationalError):
+        message = str(exc).lower()
+        return any(text in message for text in TRANSIENT_SQLITE_MESSAGES)
+    return False
+
+
+class CircuitOpenError(Exception):
+    """Raised when the circuit breaker is open and calls fail fast."""
+
+
+class RetryBudget:
+    """Process-wide token bucket limiting how many retries may be spent."""
+
+    def __init__(self, capacity: float = 100.0, refill_per_second: float = 10.0):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.refill_per_second)
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Take tokens for one retry; return False when the budget is spent."""
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    @property
+    def available(self) -> float:
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+
+class CircuitBreaker:
+    """Opens after the failure rate over a sliding window crosses a threshold.
+
+    Outcomes are counted per call: a call that succeeds after retrying counts
+    as one success. Once reset_timeout has passed the breaker is half-open and
+    admits a single trial call; its outcome closes or re-opens the breaker.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: float = 0.5, window_size: int = 20,
+                 min_calls: int = 10, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self._outcomes: Deque[bool] = deque(maxlen=window_size)
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def _current_state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self._state
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def admit(self) -> Optional[str]:
+        """Start a call: the state it was admitted in, or None to fail fast."""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return state
+            if state == self.OPEN or self._trial_running:
+                return None
+            self._state = self.HALF_OPEN
+            self._trial_running = True
+            return state
+
+    def allow_request(self) -> bool:
+        """admit() as a bool; an admitted call must record an outcome or be released."""
+        return self.admit() is not None
+
+    def release(self, admitted: Optional[str]) -> None:
+        """End a call without an outcome, e.g. one that hit a programming error."""
+        if admitted == self.HALF_OPEN:
+            with self._lock:
+                self._trial_running = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._state = self.CLOSED
+                self._trial_running = False
+                self._outcomes.clear()
+            self._outcomes.append(True)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._trip()
+                return
+            self._outcomes.append(False)
+            if len(self._outcomes) >= self.min_calls:
+                failures = self._outcomes.count(False)
+                if failures / len(self._outcomes) >= self.failure_threshold:
+                    self._trip()
+
+    def _trip(self) -> None:
+        self._state = self.OPEN
+        self._trial_running = False
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        logger.error("Circuit breaker opened")
+
+
+class RetryMetrics:
+    """Counters describing how a decorated function has been retried."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.attempts = 0
+        self.retries = 0
+        self.successes = 0
+        self.failures = 0
+        self.total_wait = 0.0
+        self.budget_exhausted = 0
+        self.short_circuited = 0
+
+    def incr(self, name: str, amount: float = 1) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "attempts": self.attempts,
+                "retries": self.retries,
+                "successes": self.successes,
+                "failures": self.failures,
+                "total_wait": self.total_wait,
+                "budget_exhausted": self.budget_exhausted,
+                "short_circuited": self.short_circuited,
+            }
+
+
+# Shared by every decorated function in the process unless one is passed in
+default_retry_budget = RetryBudget()
+
+
+def compute_backoff(attempt: int, delay: float, backoff: float,
+                    max_delay: float, jitter: bool) -> float:
+    """Exponential backoff for the given retry number, with full jitter."""
+    wait = min(max_delay, delay * (backoff ** (attempt - 1)))
+    if jitter:
+        wait = random.uniform(0, wait)
+    return wait
+
+
+def retry_on_failure(retries: int = 3, delay: float = 2, backoff: float = 2.0,
+                     max_delay: float = 30.0, jitter: bool = True,
+                     retry_on: Callable[[BaseException], bool] = is_retryable,
+                     budget: Optional[RetryBudget] = default_retry_budget,
+                     breaker: Optional[CircuitBreaker] = None) -> Callable:
+
     def decorator(func: Callable) -> Callable:
+        circuit = breaker if breaker is not None else CircuitBreaker()
+        metrics = RetryMetrics()
+
+        def before_call() -> str:
+            metrics.incr("calls")
+            admitted = circuit.admit()
+            if admitted is None:
+                metrics.incr("short_circuited")
+                raise CircuitOpenError(f"Circuit open for {func.__name__}")
+            return admitted
+
+        def after_failure(e: Exception, attempts: int, admitted: str) -> float:
+            """Re-raise e if it should not be retried, else return the wait."""
+            if not retry_on(e):
+                # Programming errors say nothing about database health
+                metrics.incr("failures")
+                circuit.release(admitted)
+                raise e
+
+            if attempts > retries:
+                metrics.incr("failures")
+                circuit.record_failure()
+                logger.error(
+                    f"All {retries} retries failed for {func.__name__}: {str(e)}"
+                )
+                raise e
+
+            if budget is not None and not budget.try_acquire():
+                metrics.incr("budget_exhausted")
+                metrics.incr("failures")
+                circuit.record_failure()
+                logger.error(f"Retry budget exhausted for {func.__name__}: {str(e)}")
+                raise e
+
+            if circuit.state == circuit.OPEN:
+                # Other calls tripped the breaker meanwhile; stop retrying into it
+                metrics.incr("short_circuited")
+                circuit.release(admitted)
+                raise CircuitOpenError(f"Circuit open for {func.__name__}") from e
+
+            wait = compute_backoff(attempts, delay, backoff, max_delay, jitter)
+            logger.warning(
+                f"Attempt {attempts}/{retries} failed for {func.__name__}: {str(e)}"
+                f" - Retrying in {wait:.2f} seconds..."
+            )
+            metrics.incr("retries")
+            metrics.incr("total_wait", wait)
+            return wait
+
+        def after_success() -> None:
+            circuit.record_success()
+            metrics.incr("successes")
+
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs) -> Any:
+                admitted = before_call()
+                attempts = 0
+
+                while True:
+                    metrics.incr("attempts")
+                    try:
+                        result = await func(*args, **kwargs)
+                    except Exception as e:
+                        attempts += 1
+                        wait = after_failure(e, attempts, admitted)
+                    except BaseException:
+                        # Cancelled: no verdict on the database
+                        circuit.release(admitted)
+                        raise
+                    else:
+                        after_success()
+                        return result
+                    try:
+                        # Yield to the event loop instead of blocking it
+                        await asyncio.sleep(wait)
+                    except BaseException:
+                        circuit.release(admitted)
+                        raise
+
+            async_wrapper.metrics = metrics
+            async_wrapper.breaker = circuit
+            return async_wrapper
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs) -> Any:
+            admitted = before_call()
             attempts = 0
-            last_exception: Optional[Exception] = None
-            
-            while attempts <= retries:
+
+            while True:
+                metrics.incr("attempts")
                 try:
-                    return func(*args, **kwargs)
+                    result = func(*args, **kwargs)
                 except Exception as e:
                     attempts += 1
-                    last_exception = e
-                    
-                    if attempts <= retries:
-                        logger.warning(
-                            f"Attempt {attempts}/{retries} failed for {func.__name__}: {str(e)}"
-                            f" - Retrying in {delay} seconds..."
-                        )
-                        time.sleep(delay)
-                    else:
-                        logger.error(
-                            f"All {retries} retries failed for {func.__name__}: {str(e)}"
-                        )
-                        raise last_exception
-        
+                    wait = after_failure(e, attempts, admitted)
+                except BaseException:
+                    circuit.release(admitted)
+                    raise
+                else:
+                    after_success()
+                    return result
+                try:
+                    time.sleep(wait)
+                except BaseException:
+                    circuit.release(admitted)
+                    raise
+
+        wrapper.metrics = metrics
+        wrapper.breaker = circuit
         return wrapper
     return decorator
 
@@ -65,18 +348,25 @@ def fetch_users_with_retry(conn):
     return cursor.fetchall()
 
 
+@with_db_connection
+@retry_on_failure(retries=3, delay=1)
+async def async_fetch_users_with_retry(conn):
+    cursor = await conn.execute("SELECT * FROM users")
+    return await cursor.fetchall()
+
+
 # function that simulate database errors
 @with_db_connection
 @retry_on_failure(retries=3, delay=1)
 def simulate_transient_failure(conn):
     if not hasattr(simulate_transient_failure, "attempts"):
         simulate_transient_failure.attempts = 0
-    
+
     simulate_transient_failure.attempts += 1
-    
+
     if simulate_transient_failure.attempts <= 2:
         raise sqlite3.OperationalError("Simulated transient error: database is locked")
-    
+
     cursor = conn.cursor()
     cursor.execute("SELECT * FROM users")
     return cursor.fetchall()
@@ -85,7 +375,7 @@ def simulate_transient_failure(conn):
 if __name__ == "__main__":
     conn = sqlite3.connect('users.db')
     cursor = conn.cursor()
-    
+
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS users (
         id INTEGER PRIMARY KEY,
@@ -93,23 +383,28 @@ if __name__ == "__main__":
         email TEXT NOT NULL
     )
     ''')
-    
+
     test_users = [
         (1, "John Doe", "johndoe@example.com"),
         (2, "Spencer James", "james@example.com")
     ]
-    
+
     for user in test_users:
         cursor.execute("INSERT OR IGNORE INTO users (id, name, email) VALUES (?, ?, ?)", user)
-    
+
     conn.commit()
     conn.close()
-    
+
     print("1. Regular fetch without simulated errors:")
     users = fetch_users_with_retry()
     print(users)
-    
+
     print("\n2. Fetch with simulated transient errors:")
     print("   (This should retry and succeed after 2 failures)")
     users = simulate_transient_failure()
-    print(f"   Success on 3rd attempt: {users}")
\ No newline at end of file
+    print(f"   Success on 3rd attempt: {users}")
+    print(f"   Retry metrics: {simulate_transient_failure.metrics.snapshot()}")
+
+    if aiosqlite is not None:
+        print("\n3. Async fetch with the same retry policy:")
+        print(asyncio.run(async_fetch_users_with_retry()))
@@ -1,8 +1,19 @@
 import time
+import zlib
+import pickle
+import marshal
 import sqlite3 
+import asyncio
 import functools
 import logging
-from typing import Tuple, List, Dict, Callable
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Tuple, List, Dict, Callable, Optional
+
+try:
+    import aiosqlite
+except ImportError:  # only needed for coroutine functions
+    aiosqlite = None
 
 # Conf logging
 logging.basicConfig(
@@ -13,8 +24,441 @@ logger = logging.getLogger(__name__)
 
 query_cache: Dict[str, Tuple[List[Tuple], float]] = {}
 
+# One-byte header on encoded results: raw pickle or zlib-compressed pickle
+_RAW, _ZLIB = b"P", b"Z"
+
+
+def encode_result(value: Any, compress: bool = False, level: int = 6) -> bytes:
+    """Serialize a result set to a single compact blob."""
+    payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    if compress:
+        return _ZLIB + zlib.compress(payload, level)
+    return _RAW + payload
+
+
+def decode_result(blob: bytes) -> Any:
+    header, payload = blob[:1], blob[1:]
+    if header == _ZLIB:
+        return pickle.loads(zlib.decompress(payload))
+    if header == _RAW:
+        return pickle.loads(payload)
+    # Entries written before results carried a header
+    return pickle.loads(blob)
+
+
+# Headers for the data-only encoding used by caches other processes can write
+_MARSHAL, _MARSHAL_ZLIB = b"M", b"N"
+
+
+def encode_data(value: Any, compress: bool = False, level: int = 6) -> bytes:
+    """Serialize rows of built-in values without pickle.
+
+    marshal only rebuilds data on load, never runs code, so a shared cache
+    file cannot be used to execute code in its readers. Raises ValueError for
+    values it cannot represent.
+    """
+    payload = marshal.dumps(value)
+    if compress:
+        return _MARSHAL_ZLIB + zlib.compress(payload, level)
+    return _MARSHAL + payload
+
+
+def decode_data(blob: bytes) -> Any:
+    header, payload = blob[:1], blob[1:]
+    if header == _MARSHAL_ZLIB:
+        return marshal.loads(zlib.decompress(payload))
+    if header == _MARSHAL:
+        return marshal.loads(payload)
+    # Pickled entries are never loaded from a shared file
+    raise ValueError(f"unexpected cache entry header {header!r}")
+
+
+class EncodedResult:
+    """Blob held in memory in place of the row objects; decoded on each hit."""
+
+    __slots__ = ("blob",)
+
+    def __init__(self, blob: bytes):
+        self.blob = blob
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.blob)
+
+    def decode(self) -> Any:
+        return decode_result(self.blob)
+
+
+class CacheBackend:
+    """Storage for cache_query entries; records per-operation latency."""
+
+    name = "base"
+    # Whether keys must say which database a result came from
+    per_database = False
+
+    def __init__(self):
+        self._stats_lock = threading.Lock()
+        self._counts = {"get": 0, "hit": 0, "set": 0}
+        self._latency = {"get": 0.0, "set": 0.0}
+
+    def _timed(self, op: str, started: float) -> None:
+        with self._stats_lock:
+            self._counts[op] += 1
+            self._latency[op] += time.perf_counter() - started
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        started = time.perf_counter()
+        entry = self._get(key)
+        self._timed("get", started)
+        if entry is not None:
+            with self._stats_lock:
+                self._counts["hit"] += 1
+        return entry
+
+    def set(self, key: str, value: Any, timestamp: float) -> None:
+        started = time.perf_counter()
+        self._set(key, value, timestamp)
+        self._timed("set", started)
+
+    def stats(self) -> Dict[str, float]:
+        with self._stats_lock:
+            gets, sets = self._counts["get"], self._counts["set"]
+            return {
+                "backend": self.name,
+                "gets": gets,
+                "hits": self._counts["hit"],
+                "sets": sets,
+                "avg_get_latency": self._latency["get"] / gets if gets else 0.0,
+                "avg_set_latency": self._latency["set"] / sets if sets else 0.0,
+                **self._usage(),
+            }
+
+    def _usage(self) -> Dict[str, int]:
+        """Entry count and, where it is known exactly, stored bytes."""
+        return {}
+
+    def _get(self, key: str) -> Optional[Tuple[Any, float]]:
+        raise NotImplementedError
+
+    def _set(self, key: str, value: Any, timestamp: float) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+
+class MemoryCacheBackend(CacheBackend):
+    """Private per-process dict; the original query_cache behaviour.
+
+    With compact=True results are kept as EncodedResult blobs, so the cache
+    knows its exact size and max_bytes can evict least recently used entries;
+    a result larger than max_bytes on its own is not cached.
+    """
+
+    name = "memory"
+
+    def __init__(self, store: Optional[Dict[str, Tuple[Any, float]]] = None,
+                 compact: bool = False, compress: bool = False,
+                 max_bytes: Optional[int] = None):
+        super().__init__()
+        compact = compact or compress
+        if max_bytes is not None and not compact:
+            raise ValueError("max_bytes needs compact=True to measure entry sizes")
+        self.store = query_cache if store is None else store
+        self.compact = compact
+        self.compress = compress
+        self.max_bytes = max_bytes
+        self.bytes_used = 0
+        # Guards the dict for threads and coroutines alike; never held across an await
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _entry_size(key: str, value: Any) -> int:
+        if isinstance(value, EncodedResult):
+            return len(key.encode()) + value.nbytes
+        return 0
+
+    def _get(self, key):
+        with self._lock:
+            entry = self.store.get(key)
+            if entry is None:
+                return None
+            if self.max_bytes is not None:
+                # Dicts keep insertion order, so re-inserting marks it most recent
+                self.store[key] = self.store.pop(key)
+        value, timestamp = entry
+        if isinstance(value, EncodedResult):
+            # Decoded outside the lock, only once somebody asks for it
+            value = value.decode()
+        return value, timestamp
+
+    def _set(self, key, value, timestamp):
+        if self.compact:
+            value = EncodedResult(encode_result(value, self.compress))
+            if self.max_bytes is not None and self._entry_size(key, value) > self.max_bytes:
+                # Too large to fit even alone; drop any older value rather than serve it
+                self.delete(key)
+                return
+        with self._lock:
+            previous = self.store.pop(key, None)
+            if previous is not None:
+                self.bytes_used -= self._entry_size(key, previous[0])
+            self.store[key] = (value, timestamp)
+            self.bytes_used += self._entry_size(key, value)
+            if self.max_bytes is not None:
+                while self.bytes_used > self.max_bytes:
+                    oldest = next(iter(self.store))
+                    self.bytes_used -= self._entry_size(oldest, self.store.pop(oldest)[0])
+
+    def delete(self, key):
+        with self._lock:
+            entry = self.store.pop(key, None)
+            if entry is not None:
+                self.bytes_used -= self._entry_size(key, entry[0])
+
+    def clear(self):
+        with self._lock:
+            self.store.clear()
+            self.bytes_used = 0
+
+    def _usage(self):
+        with self._lock:
+            usage = {"entries": len(self.store)}
+            if self.compact:
+                usage["bytes"] = self.bytes_used
+            return usage
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """Cache file shared by every process on the host, evicted in LRU order.
+
+    A hit only rewrites last_access once it is touch_interval seconds old, so
+    hot keys do not turn every read into a write. A locked or busy file is
+    treated as a miss rather than failing the query.
+
+    Results are stored with encode_data, never pickle, and keys include the
+    path of the database they were read from, so processes sharing the file
+    only share results of the same database.
+    """
+
+    name = "sqlite"
+    per_database = True
+
+    def __init__(self, path: str = 'query_cache.db', max_entries: int = 1024,
+                 max_bytes: Optional[int] = None, compress: bool = False,
+                 touch_interval: float = 1.0):
+        super().__init__()
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.touch_interval = touch_interval
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections are per thread; WAL lets readers in other
+        # processes proceed while one of them writes. Opened lazily so that
+        # declaring a backend does not touch the filesystem.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                created REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_lru ON cache (last_access)")
+            self._local.conn = conn
+        return conn
+
+    def _get(self, key):
+        try:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT value, created, last_access FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            if now - row[2] >= self.touch_interval:
+                conn.execute("UPDATE cache SET last_access = ? WHERE key = ?", (now, key))
+            value = decode_data(row[0])
+        except sqlite3.OperationalError as error:
+            logger.warning(f"Cache read failed, treating it as a miss: {error}")
+            return None
+        except (ValueError, EOFError, TypeError, zlib.error) as error:
+            logger.warning(f"Unreadable cache entry, treating it as a miss: {error}")
+            return None
+        return value, row[1]
+
+    def _set(self, key, value, timestamp):
+        try:
+            blob = encode_data(value, self.compress)
+        except ValueError as error:
+            logger.warning(f"Result cannot be stored in the shared cache: {error}")
+            return
+        try:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache (key, value, created, last_access) VALUES (?, ?, ?, ?)",
+                    (key, blob, timestamp, time.time())
+                )
+                conn.execute(
+                    "DELETE FROM cache WHERE key IN ("
+                    " SELECT key FROM cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                )
+                if self.max_bytes is not None:
+                    # Keep the most recently used entries whose running total fits
+                    conn.execute(
+                        "DELETE FROM cache WHERE key IN ("
+                        " SELECT key FROM (SELECT key, SUM(length(CAST(key AS BLOB)) + length(value))"
+                        " OVER (ORDER BY last_access DESC, key) AS total FROM cache)"
+                        " WHERE total > ?)",
+                        (self.max_bytes,)
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+        except sqlite3.OperationalError as error:
+            logger.warning(f"Cache write failed, result not cached: {error}")
+
+    def delete(self, key):
+        self._connection().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self):
+        self._connection().execute("DELETE FROM cache")
+
+    def _usage(self):
+        entries, size = self._connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(length(CAST(key AS BLOB)) + length(value)), 0) FROM cache"
+        ).fetchone()
+        return {"entries": entries, "bytes": size}
+
+
+default_backend = MemoryCacheBackend()
+
+
+class _Flight:
+    """One in-progress execution that concurrent callers can wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+# Handed to waiters when the leader was cancelled, so one of them takes over
+_LEADER_CANCELLED = object()
+
+
+class SingleFlight:
+    """Runs at most one execution per key at a time; later callers share it."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[str, _Flight] = {}
+        self._async_flights: Dict[Tuple[int, str], asyncio.Future] = {}
+        self.executions = 0
+        self.saved = 0
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.executions += 1
+            else:
+                self.saved += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fn()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result
+
+    async def do_async(self, key: str, fn: Callable[[], Any]) -> Any:
+        # Futures belong to one event loop, so flights are kept per loop
+        flight_key = (id(asyncio.get_running_loop()), key)
+        while True:
+            with self._lock:
+                future = self._async_flights.get(flight_key)
+                leader = future is None
+                if leader:
+                    future = self._async_flights[flight_key] = asyncio.get_running_loop().create_future()
+                    self.executions += 1
+                else:
+                    self.saved += 1
+
+            if not leader:
+                # Shield so one waiter being cancelled does not cancel the others
+                result = await asyncio.shield(future)
+                if result is _LEADER_CANCELLED:
+                    # The leader's caller went away; one waiter runs fn instead
+                    with self._lock:
+                        self.saved -= 1
+                    continue
+                return result
+
+            try:
+                result = await fn()
+            except asyncio.CancelledError:
+                # Only the leader's caller was cancelled, not the work itself
+                with self._lock:
+                    del self._async_flights[flight_key]
+                future.set_result(_LEADER_CANCELLED)
+                raise
+            except BaseException as e:
+                with self._lock:
+                    del self._async_flights[flight_key]
+                future.set_exception(e)
+                # Mark as retrieved in case nobody else was waiting
+                future.exception()
+                raise
+            with self._lock:
+                del self._async_flights[flight_key]
+            future.set_result(result)
+            return result
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"executions": self.executions, "saved": self.saved}
+
 def with_db_connection(func: Callable) -> Callable:
     
+    if asyncio.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            # Keep the connection open until the coroutine has finished
+            async with aiosqlite.connect('users.db') as conn:
+                return await func(conn, *args, **kwargs)
+
+        return async_wrapper
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         conn = sqlite3.connect('users.db')        
@@ -27,37 +471,250 @@ def with_db_connection(func: Callable) -> Callable:
     return wrapper
 
 
-def cache_query(func: Callable) -> Callable:
-    
-    @functools.wraps(func)
-    def wrapper(conn, *args, **kwargs):
-        query = kwargs.get('query')
-        if not query:
-            if args and isinstance(args[0], str):
-                query = args[0]
-            else:
+def _cache_key(args, kwargs) -> Optional[str]:
+    """The query text, followed by any other arguments such as params.
+
+    None when the call has no query to cache on.
+    """
+    query = kwargs.get('query')
+    rest = {name: value for name, value in kwargs.items() if name != 'query'}
+    if not query and args and isinstance(args[0], str):
+        query, args = args[0], args[1:]
+    if not query:
+        return None
+    if not args and not rest:
+        return query
+    # The same SQL with different parameters is a different result
+    return f"{query} -- {args!r} {sorted(rest.items())!r}"
+
+
+FRESH, STALE, EXPIRED = "fresh", "stale", "expired"
+
+
+def _freshness(timestamp: float, ttl: Optional[float], hard_ttl: Optional[float],
+               stale_while_revalidate: bool) -> str:
+    age = time.time() - timestamp
+    if hard_ttl is not None and age >= hard_ttl:
+        return EXPIRED
+    if ttl is None or age < ttl:
+        return FRESH
+    return STALE if stale_while_revalidate else EXPIRED
+
+
+def _cache_lookup(backend: CacheBackend, query: str, ttl: Optional[float] = None,
+                  hard_ttl: Optional[float] = None, stale_while_revalidate: bool = False):
+    entry = backend.get(query)
+    if entry is None:
+        logger.info(f"Cache miss for query: {query[:50]}...")
+        return None, EXPIRED
+    cached_result, timestamp = entry
+    cache_age = time.time() - timestamp
+    state = _freshness(timestamp, ttl, hard_ttl, stale_while_revalidate)
+    if state == EXPIRED:
+        logger.info(f"Cache entry expired for query: {query[:50]}... (Age: {cache_age:.2f}s)")
+        return None, EXPIRED
+    logger.info(f"Cache {'hit' if state == FRESH else 'stale hit'} for query: {query[:50]}... (Age: {cache_age:.2f}s)")
+    return entry, state
+
+
+def _cache_store(backend: CacheBackend, query: str, result, execution_time: float) -> None:
+    backend.set(query, result, time.time())
+    logger.info(f"Query executed in {execution_time:.4f}s and cached")
+
+
+def _database_path(rows) -> Optional[str]:
+    # From PRAGMA database_list; in-memory and temporary databases have no file
+    for _, name, path in rows:
+        if name == "main":
+            return path or None
+    return None
+
+
+_NO_DATABASE_FILE = "the caller's database has no file to reopen; pass connect="
+_NO_SHARED_KEY = "Database has no file to name in a shared cache key; not caching"
+
+
+# Background revalidation runs on one worker thread (sync) or a loop task (async)
+_refresh_executor: Optional[ThreadPoolExecutor] = None
+_refresh_executor_lock = threading.Lock()
+_background_tasks: set = set()
+
+
+def _get_refresh_executor() -> ThreadPoolExecutor:
+    global _refresh_executor
+    with _refresh_executor_lock:
+        if _refresh_executor is None:
+            _refresh_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-refresh")
+        return _refresh_executor
+
+
+def cache_query(func: Optional[Callable] = None, *,
+                backend: Optional[CacheBackend] = None,
+                ttl: Optional[float] = None, hard_ttl: Optional[float] = None,
+                stale_while_revalidate: bool = False,
+                connect: Optional[Callable] = None) -> Callable:
+
+    if stale_while_revalidate and ttl is None:
+        raise ValueError("stale_while_revalidate needs a soft ttl")
+
+    def decorator(func: Callable) -> Callable:
+        store = backend if backend is not None else default_backend
+        # Concurrent misses for the same query share a single execution
+        flights = SingleFlight()
+        # Queries with a background refresh in progress
+        refreshing: set = set()
+        refresh_lock = threading.Lock()
+        revalidation = {"stale_hits": 0, "refreshes": 0, "refresh_errors": 0}
+
+        def lookup(query: str):
+            entry, state = _cache_lookup(store, query, ttl, hard_ttl, stale_while_revalidate)
+            if state == STALE:
+                with refresh_lock:
+                    revalidation["stale_hits"] += 1
+            return entry, state
+
+        def claim_refresh(query: str) -> bool:
+            with refresh_lock:
+                if query in refreshing:
+                    return False
+                refreshing.add(query)
+                revalidation["refreshes"] += 1
+                return True
+
+        def finish_refresh(query: str, error: Optional[BaseException]) -> None:
+            with refresh_lock:
+                refreshing.discard(query)
+                if error is not None:
+                    revalidation["refresh_errors"] += 1
+            if error is not None:
+                logger.warning(f"Background refresh failed for query: {query[:50]}...: {error}")
+
+        if asyncio.iscoroutinefunction(func):
+            async def revalidate(query, open_connection, args, kwargs):
+                error = None
+                try:
+                    # The caller's connection is closed by now, so open our own
+                    async with open_connection() as conn:
+                        start_time = time.time()
+                        result = await func(conn, *args, **kwargs)
+                        _cache_store(store, query, result, time.time() - start_time)
+                except Exception as e:
+                    error = e
+                finally:
+                    finish_refresh(query, error)
+
+            @functools.wraps(func)
+            async def async_wrapper(conn, *args, **kwargs):
+                key = _cache_key(args, kwargs)
+                if not key:
+                    logger.warning("No query provided for caching")
+                    return await func(conn, *args, **kwargs)
+                if store.per_database:
+                    cursor = await conn.execute("PRAGMA database_list")
+                    path = _database_path(await cursor.fetchall())
+                    if path is None:
+                        logger.warning(_NO_SHARED_KEY)
+                        return await func(conn, *args, **kwargs)
+                    key = f"{key} @ {path}"
+
+                entry, state = lookup(key)
+                if entry is not None:
+                    if state == STALE and claim_refresh(key):
+                        open_connection = connect
+                        if open_connection is None:
+                            # Reopen whatever database the caller was using
+                            cursor = await conn.execute("PRAGMA database_list")
+                            path = _database_path(await cursor.fetchall())
+                            open_connection = path and functools.partial(aiosqlite.connect, path)
+                        if open_connection is None:
+                            finish_refresh(key, ValueError(_NO_DATABASE_FILE))
+                        else:
+                            task = asyncio.get_running_loop().create_task(
+                                revalidate(key, open_connection, args, kwargs))
+                            _background_tasks.add(task)
+                            task.add_done_callback(_background_tasks.discard)
+                    return entry[0]
+
+                async def load():
+                    # A previous flight may have filled the cache meanwhile
+                    entry = store.get(key)
+                    if entry is not None and _freshness(entry[1], ttl, hard_ttl, stale_while_revalidate) != EXPIRED:
+                        return entry[0]
+                    start_time = time.time()
+                    result = await func(conn, *args, **kwargs)
+                    _cache_store(store, key, result, time.time() - start_time)
+                    return result
+
+                return await flights.do_async(key, load)
+
+            async_wrapper.cache_backend = store
+            async_wrapper.single_flight = flights
+            async_wrapper.revalidation_stats = revalidation
+            return async_wrapper
+
+        def revalidate(query, open_connection, args, kwargs):
+            error = None
+            try:
+                # The caller's connection is closed by now, so open our own
+                conn = open_connection()
+                try:
+                    start_time = time.time()
+                    result = func(conn, *args, **kwargs)
+                    _cache_store(store, query, result, time.time() - start_time)
+                finally:
+                    conn.close()
+            except Exception as e:
+                error = e
+            finally:
+                finish_refresh(query, error)
+
+        @functools.wraps(func)
+        def wrapper(conn, *args, **kwargs):
+            key = _cache_key(args, kwargs)
+            if not key:
                 logger.warning("No query provided for caching")
                 return func(conn, *args, **kwargs)
-        
-        cache_key = query
-        
-        if cache_key in query_cache:
-            cached_result, timestamp = query_cache[cache_key]
-            cache_age = time.time() - timestamp
-            logger.info(f"Cache hit for query: {query[:50]}... (Age: {cache_age:.2f}s)")
-            return cached_result
-        
-        logger.info(f"Cache miss for query: {query[:50]}...")
-        start_time = time.time()
-        result = func(conn, *args, **kwargs)
-        execution_time = time.time() - start_time
-        
-        query_cache[cache_key] = (result, time.time())
-        
-        logger.info(f"Query executed in {execution_time:.4f}s and cached")
-        return result
-    
-    return wrapper
+            if store.per_database:
+                path = _database_path(conn.execute("PRAGMA database_list"))
+                if path is None:
+                    logger.warning(_NO_SHARED_KEY)
+                    return func(conn, *args, **kwargs)
+                key = f"{key} @ {path}"
+
+            entry, state = lookup(key)
+            if entry is not None:
+                if state == STALE and claim_refresh(key):
+                    open_connection = connect
+                    if open_connection is None:
+                        # Reopen whatever database the caller was using
+                        path = _database_path(conn.execute("PRAGMA database_list"))
+                        open_connection = path and functools.partial(sqlite3.connect, path)
+                    if open_connection is None:
+                        finish_refresh(key, ValueError(_NO_DATABASE_FILE))
+                    else:
+                        _get_refresh_executor().submit(revalidate, key, open_connection, args, kwargs)
+                return entry[0]
+
+            def load():
+                # A previous flight may have filled the cache meanwhile
+                entry = store.get(key)
+                if entry is not None and _freshness(entry[1], ttl, hard_ttl, stale_while_revalidate) != EXPIRED:
+                    return entry[0]
+                start_time = time.time()
+                result = func(conn, *args, **kwargs)
+                _cache_store(store, key, result, time.time() - start_time)
+                return result
+
+            return flights.do(key, load)
+
+        wrapper.cache_backend = store
+        wrapper.single_flight = flights
+        wrapper.revalidation_stats = revalidation
+        return wrapper
+
+    if func is None:
+        return decorator
+    return decorator(func)
 
 
 @with_db_connection
@@ -68,6 +725,29 @@ def fetch_users_with_cache(conn, query):
     return cursor.fetchall()
 
 
+@with_db_connection
+@cache_query(backend=SQLiteCacheBackend('query_cache.db'))
+def fetch_users_with_shared_cache(conn, query):
+    cursor = conn.cursor()
+    cursor.execute(query)
+    return cursor.fetchall()
+
+
+@with_db_connection
+@cache_query(ttl=1.0, hard_ttl=30.0, stale_while_revalidate=True)
+def fetch_users_with_revalidation(conn, query):
+    cursor = conn.cursor()
+    cursor.execute(query)
+    return cursor.fetchall()
+
+
+@with_db_connection
+@cache_query
+async def async_fetch_users_with_cache(conn, query):
+    cursor = await conn.execute(query)
+    return await cursor.fetchall()
+
+
 if __name__ == "__main__":
     conn = sqlite3.connect('users.db')
     cursor = conn.cursor()
@@ -110,4 +790,43 @@ if __name__ == "__main__":
     start_time = time.time()
     filtered_users = fetch_users_with_cache(query="SELECT * FROM users WHERE id = 1")
     print(f"   Result: {filtered_users}")
-    print(f"   Execution time: {time.time() - start_time:.6f} seconds")
\ No newline at end of file
+    print(f"   Execution time: {time.time() - start_time:.6f} seconds")
+
+    if aiosqlite is not None:
+        print("\n4. Coroutine functions share the same cache:")
+        users_async = asyncio.run(async_fetch_users_with_cache(query="SELECT * FROM users"))
+        print(f"   Result: {users_async}")
+
+    print("\n5. Shared cache file, visible to every worker process on the host:")
+    fetch_users_with_shared_cache(query="SELECT * FROM users")
+    fetch_users_with_shared_cache(query="SELECT * FROM users")
+    print(f"   Memory backend: {fetch_users_with_cache.cache_backend.stats()}")
+    print(f"   SQLite backend: {fetch_users_with_shared_cache.cache_backend.stats()}")
+
+    print("\n6. Concurrent misses for the same query run it only once:")
+    fetch_users_with_cache.cache_backend.clear()
+    workers = [
+        threading.Thread(target=fetch_users_with_cache, kwargs={"query": "SELECT * FROM users"})
+        for _ in range(20)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    print(f"   Single-flight: {fetch_users_with_cache.single_flight.stats()}")
+
+    print("\n7. Stale entries are served at once while one worker refreshes them:")
+    fetch_users_with_revalidation.cache_backend.clear()
+    fetch_users_with_revalidation(query="SELECT * FROM users")
+    time.sleep(1.1)
+    start_time = time.time()
+    fetch_users_with_revalidation(query="SELECT * FROM users")
+    print(f"   Stale read took {time.time() - start_time:.6f} seconds")
+    time.sleep(0.1)
+    print(f"   Revalidation: {fetch_users_with_revalidation.revalidation_stats}")
+
+    print("\n8. Compact storage keeps results as compressed blobs with exact sizes:")
+    compact_backend = MemoryCacheBackend({}, compress=True, max_bytes=64 * 1024)
+    compact_backend.set("SELECT * FROM users", users, time.time())
+    print(f"   Decoded on hit: {compact_backend.get('SELECT * FROM users')[0]}")
+    print(f"   Usage: {compact_backend.stats()['bytes']} bytes in {compact_backend.stats()['entries']} entries")
\ No newline at end of file
@@ -0,0 +1,329 @@
+import re
+import time
+import sqlite3
+import asyncio
+import functools
+import importlib
+import logging
+import sys
+import threading
+import warnings
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    import aiosqlite
+except ImportError:  # only needed for coroutine functions
+    aiosqlite = None
+
+# Conf logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+class FullTableScanError(Exception):
+    """Raised when a query plan scans a table larger than allowed."""
+
+
+class FullTableScanWarning(UserWarning):
+    """Warned when a query plan scans a table larger than allowed."""
+
+
+class QueryProfile:
+    """Plan of one query fingerprint on one database, plus its timings.
+
+    Only the raw plan and the tables it scans are stored; whether a scan is
+    too large is decided per call, by each decorator's max_scan_rows.
+    """
+
+    def __init__(self, database: str, fingerprint: str, plan: List[str], scanned_tables: List[str]):
+        self.database = database
+        self.fingerprint = fingerprint
+        self.plan = plan
+        self.scanned_tables = scanned_tables
+        self.calls = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def record(self, elapsed: float) -> None:
+        self.calls += 1
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+
+    @property
+    def avg_time(self) -> float:
+        return self.total_time / self.calls if self.calls else 0.0
+
+
+# Keyed by (database file, fingerprint)
+query_profiles: Dict[Tuple[str, str], QueryProfile] = {}
+# (database file, table) -> (row count, when it was counted)
+_table_sizes: Dict[Tuple[str, str], Tuple[int, float]] = {}
+_profile_lock = threading.Lock()
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+# "SCAN users" on SQLite >= 3.36, "SCAN TABLE users" before that. The name
+# is the alias when the query gives one, and may be "CONSTANT ROW" or a
+# subquery; scans that go through an index end in "USING ...".
+_TABLE_SCAN = re.compile(r"^SCAN (?:TABLE )?(.+?)( USING .*)?$")
+_TABLES_QUERY = "SELECT name FROM sqlite_master WHERE type = 'table'"
+
+
+def fingerprint_query(query: str) -> str:
+    """Normalize literals and whitespace so similar queries share one plan."""
+    fingerprint = _STRING_LITERAL.sub("?", query)
+    fingerprint = _NUMBER_LITERAL.sub("?", fingerprint)
+    return _WHITESPACE.sub(" ", fingerprint).strip().lower()
+
+
+def _find_query(args, kwargs) -> Tuple[Optional[str], tuple]:
+    query = kwargs.get('query')
+    params = kwargs.get('params', ())
+    if not query:
+        for index, arg in enumerate(args):
+            if isinstance(arg, str):
+                query = arg
+                if not params and len(args) > index + 1 and isinstance(args[index + 1], (tuple, list)):
+                    params = args[index + 1]
+                break
+    return query, tuple(params or ())
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _resolve_table(name: str, query: str, tables: Dict[str, str]) -> Optional[str]:
+    """The table a plan's scan refers to, or None if it is not a table."""
+    schema, _, table = name.rpartition(".")
+    if schema.lower() in ("", "main") and table.lower() in tables:
+        return tables[table.lower()]
+    # Otherwise it is an alias; find "<table> [AS] <alias>" in the query
+    alias = re.escape(name)
+    pattern = rf'(\w+|"(?:[^"]|"")+")\s+(?:AS\s+)?(?:{alias}|"{alias}")(?!\w)'
+    for match in re.finditer(pattern, query, re.IGNORECASE):
+        candidate = match.group(1)
+        if candidate.startswith('"'):
+            candidate = candidate[1:-1].replace('""', '"')
+        if candidate.lower() in tables:
+            return tables[candidate.lower()]
+    return None
+
+
+def _scanned_tables(plan: List[str], query: str, table_names: List[str]) -> List[str]:
+    """Tables of the main database the plan reads without an index."""
+    tables = {name.lower(): name for name in table_names}
+    scanned = []
+    for detail in plan:
+        match = _TABLE_SCAN.match(detail)
+        if match and not match.group(2):
+            table = _resolve_table(match.group(1), query, tables)
+            if table is not None and table not in scanned:
+                scanned.append(table)
+    return scanned
+
+
+def _stale_tables(database: str, tables: List[str], ttl: float) -> List[str]:
+    now = time.monotonic()
+    with _profile_lock:
+        return [table for table in tables
+                if (database, table) not in _table_sizes or now - _table_sizes[(database, table)][1] >= ttl]
+
+
+def _store_table_size(database: str, table: str, rows: int) -> None:
+    with _profile_lock:
+        _table_sizes[(database, table)] = (rows, time.monotonic())
+
+
+def _full_scans(profile: QueryProfile, max_scan_rows: int) -> List[Tuple[str, int]]:
+    with _profile_lock:
+        sizes = [(table, _table_sizes[(profile.database, table)][0]) for table in profile.scanned_tables]
+    return [(table, rows) for table, rows in sizes if rows > max_scan_rows]
+
+
+def _caller_stacklevel() -> int:
+    """stacklevel that points a warning at the first frame outside the decorators."""
+    frame, level = sys._getframe(1), 1
+    # Module-level code is the caller even when it lives in one of those files
+    while (frame is not None and frame.f_code.co_filename in _DECORATOR_FILES
+           and frame.f_code.co_name != "<module>"):
+        frame, level = frame.f_back, level + 1
+    return level
+
+
+def _check_scans(fingerprint: str, full_scans: List[Tuple[str, int]], on_scan: str) -> None:
+    for table, rows in full_scans:
+        message = f"Full table scan on {table} ({rows} rows) for query: {fingerprint[:80]}"
+        if on_scan == "raise":
+            raise FullTableScanError(message)
+        logger.warning(message)
+        warnings.warn(message, FullTableScanWarning, stacklevel=_caller_stacklevel())
+
+
+def profile_queries(func: Optional[Callable] = None, *, max_scan_rows: int = 1000,
+                    on_scan: str = "warn", table_size_ttl: float = 60.0) -> Callable:
+    """Explain each query once per database and flag scans of large tables.
+
+    Table sizes are recounted once they are older than table_size_ttl
+    seconds, so a table that grows is flagged once it passes max_scan_rows.
+    """
+
+    if on_scan not in ("warn", "raise"):
+        raise ValueError("on_scan must be 'warn' or 'raise'")
+
+    def explain(conn, query: str, params: tuple) -> QueryProfile:
+        database = conn.execute("PRAGMA database_list").fetchone()[2]
+        fingerprint = fingerprint_query(query)
+        with _profile_lock:
+            profile = query_profiles.get((database, fingerprint))
+        if profile is None:
+            rows = conn.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()
+            plan = [row[-1] for row in rows]
+            tables = [row[0] for row in conn.execute(_TABLES_QUERY)]
+            profile = QueryProfile(database, fingerprint, plan, _scanned_tables(plan, query, tables))
+            with _profile_lock:
+                profile = query_profiles.setdefault((database, fingerprint), profile)
+            logger.info(f"Query plan for {fingerprint[:50]}...: {' | '.join(plan)}")
+        for table in _stale_tables(database, profile.scanned_tables, table_size_ttl):
+            _store_table_size(database, table, conn.execute(f"SELECT COUNT(*) FROM {_quote(table)}").fetchone()[0])
+        return profile
+
+    async def explain_async(conn, query: str, params: tuple) -> QueryProfile:
+        cursor = await conn.execute("PRAGMA database_list")
+        database = (await cursor.fetchone())[2]
+        fingerprint = fingerprint_query(query)
+        with _profile_lock:
+            profile = query_profiles.get((database, fingerprint))
+        if profile is None:
+            cursor = await conn.execute(f"EXPLAIN QUERY PLAN {query}", params)
+            plan = [row[-1] for row in await cursor.fetchall()]
+            cursor = await conn.execute(_TABLES_QUERY)
+            tables = [row[0] for row in await cursor.fetchall()]
+            profile = QueryProfile(database, fingerprint, plan, _scanned_tables(plan, query, tables))
+            with _profile_lock:
+                profile = query_profiles.setdefault((database, fingerprint), profile)
+            logger.info(f"Query plan for {fingerprint[:50]}...: {' | '.join(plan)}")
+        for table in _stale_tables(database, profile.scanned_tables, table_size_ttl):
+            cursor = await conn.execute(f"SELECT COUNT(*) FROM {_quote(table)}")
+            _store_table_size(database, table, (await cursor.fetchone())[0])
+        return profile
+
+    def decorator(func: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(conn, *args, **kwargs):
+                query, params = _find_query(args, kwargs)
+                if not query:
+                    return await func(conn, *args, **kwargs)
+
+                try:
+                    profile = await explain_async(conn, query, params)
+                except sqlite3.Error as error:
+                    # Profiling must never keep the query itself from running
+                    logger.warning(f"Could not profile query: {query[:50]}...: {error}")
+                    return await func(conn, *args, **kwargs)
+                _check_scans(profile.fingerprint, _full_scans(profile, max_scan_rows), on_scan)
+                start_time = time.perf_counter()
+                result = await func(conn, *args, **kwargs)
+                with _profile_lock:
+                    profile.record(time.perf_counter() - start_time)
+                return result
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(conn, *args, **kwargs):
+            query, params = _find_query(args, kwargs)
+            if not query:
+                return func(conn, *args, **kwargs)
+
+            try:
+                profile = explain(conn, query, params)
+            except sqlite3.Error as error:
+                # Profiling must never keep the query itself from running
+                logger.warning(f"Could not profile query: {query[:50]}...: {error}")
+                return func(conn, *args, **kwargs)
+            _check_scans(profile.fingerprint, _full_scans(profile, max_scan_rows), on_scan)
+            start_time = time.perf_counter()
+            result = func(conn, *args, **kwargs)
+            with _profile_lock:
+                profile.record(time.perf_counter() - start_time)
+            return result
+
+        return wrapper
+
+    if func is None:
+        return decorator
+    return decorator(func)
+
+
+def with_db_connection(func: Callable) -> Callable:
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        conn = sqlite3.connect('users.db')
+        try:
+            result = func(conn, *args, **kwargs)
+            return result
+        finally:
+            conn.close()
+
+    return wrapper
+
+
+# The real caching decorator from 4-cache_query.py
+_cache_module = importlib.import_module("4-cache_query")
+cache_query = _cache_module.cache_query
+
+# Warnings skip the frames of decorators stacked around the profiled function
+_DECORATOR_FILES = {__file__, _cache_module.__file__}
+
+
+# Profile below the cache so hits are not timed against the plan
+@with_db_connection
+@cache_query
+@profile_queries(max_scan_rows=1)
+def fetch_users(conn, query, params=()):
+    cursor = conn.cursor()
+    cursor.execute(query, params)
+    return cursor.fetchall()
+
+
+if __name__ == "__main__":
+    conn = sqlite3.connect('users.db')
+    cursor = conn.cursor()
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        email TEXT NOT NULL
+    )
+    ''')
+
+    test_users = [
+        (1, "John Doe", "johndoe@example.com"),
+        (2, "Spencer James", "james@example.com"),
+    ]
+
+    for user in test_users:
+        cursor.execute("INSERT OR IGNORE INTO users (id, name, email) VALUES (?, ?, ?)", user)
+
+    conn.commit()
+    conn.close()
+
+    print("1. Primary key lookup uses the index:")
+    print(f"   {fetch_users(query='SELECT * FROM users WHERE id = ?', params=(1,))}")
+
+    print("\n2. Filtering on an unindexed column scans the table:")
+    print(f"   {fetch_users(query='SELECT * FROM users WHERE email = ?', params=('james@example.com',))}")
+
+    print("\n3. Collected profiles:")
+    for profile in query_profiles.values():
+        print(f"   {profile.fingerprint} on {profile.database}")
+        print(f"      plan: {profile.plan}, scanned tables: {profile.scanned_tables}")
+        print(f"      calls: {profile.calls}, avg: {profile.avg_time:.6f}s, max: {profile.max_time:.6f}s")
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+6-benchmark_decorators.py - Per-call overhead and allocations of each decorator
+
+Every scenario runs against a shared in-memory SQLite database and is timed
+with timeit; allocations are measured with tracemalloc. Results are printed
+as JSON (or written with --output) and can be compared against a previous
+run with --compare to catch regressions.
+
+    python 6-benchmark_decorators.py --output baseline.json
+    python 6-benchmark_decorators.py --compare baseline.json --threshold 1.25
+"""
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import logging
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import timeit
+import tracemalloc
+import types
+from typing import Callable, Dict, List, Tuple
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MEMORY_DB = "file:decorator_bench?mode=memory&cache=shared"
+QUERY = "SELECT * FROM users WHERE id = 1"
+
+
+def _memory_sqlite() -> types.SimpleNamespace:
+    """A stand-in for the sqlite3 module whose connect() opens the bench DB."""
+    shim = types.SimpleNamespace(**{name: getattr(sqlite3, name) for name in dir(sqlite3)
+                                    if not name.startswith("__")})
+    shim.connect = lambda *args, **kwargs: sqlite3.connect(
+        MEMORY_DB, uri=True, check_same_thread=False
+    )
+    return shim
+
+
+def load_module(filename: str) -> types.ModuleType:
+    """Import one of the numbered example scripts, pointed at the bench DB."""
+    name = "bench_" + filename.split("-", 1)[1].rsplit(".", 1)[0]
+    spec = importlib.util.spec_from_file_location(name, os.path.join(HERE, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    # The decorators look sqlite3 up at call time, so this redirects them
+    module.sqlite3 = _memory_sqlite()
+    return module
+
+
+def setup_database() -> sqlite3.Connection:
+    # The shared in-memory database lives as long as one connection is open
+    keeper = sqlite3.connect(MEMORY_DB, uri=True, check_same_thread=False)
+    keeper.execute("CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY, name TEXT NOT NULL, email TEXT NOT NULL)")
+    keeper.executemany(
+        "INSERT OR REPLACE INTO users (id, name, email) VALUES (?, ?, ?)",
+        [(i, f"user{i}", f"user{i}@example.com") for i in range(1, 101)]
+    )
+    keeper.commit()
+    return keeper
+
+
+def build_scenarios(conn: sqlite3.Connection) -> Dict[str, Callable[[], object]]:
+    log_mod = load_module("0-log_queries.py")
+    conn_mod = load_module("1-with_db_connection.py")
+    tx_mod = load_module("2-transactional.py")
+    retry_mod = load_module("3-retry_on_failure.py")
+    cache_mod = load_module("4-cache_query.py")
+    profile_mod = load_module("5-profile_queries.py")
+
+    def fetch(conn, query=QUERY):
+        return conn.execute(query).fetchall()
+
+    def update(conn):
+        conn.execute("UPDATE users SET name = name WHERE id = 1")
+
+    def fetch_own_connection(query=QUERY):
+        return fetch(conn, query)
+
+    logged = log_mod.log_queries(fetch_own_connection)
+    cached = cache_mod.cache_query(backend=cache_mod.MemoryCacheBackend({}))(fetch)
+    compact_cached = cache_mod.cache_query(
+        backend=cache_mod.MemoryCacheBackend({}, compress=True)
+    )(fetch)
+    retried = retry_mod.retry_on_failure(retries=3, delay=0)(fetch)
+    profiled = profile_mod.profile_queries(max_scan_rows=10 ** 9)(fetch)
+    transactional = tx_mod.transactional(update)
+
+    stack_connection = conn_mod.with_db_connection(fetch)
+    stack_retry = retry_mod.with_db_connection(retry_mod.retry_on_failure(retries=3, delay=0)(fetch))
+    stack_cache = cache_mod.with_db_connection(
+        cache_mod.cache_query(backend=cache_mod.MemoryCacheBackend({}))(fetch)
+    )
+    stack_transactional = tx_mod.with_db_connection(tx_mod.transactional(update))
+    stack_profile = profile_mod.with_db_connection(
+        profile_mod.cache_query(profile_mod.profile_queries(max_scan_rows=10 ** 9)(fetch))
+    )
+
+    return {
+        "baseline": lambda: fetch(conn),
+        "log_queries": lambda: logged(QUERY),
+        "with_db_connection": lambda: stack_connection(),
+        "transactional": lambda: transactional(conn),
+        "retry_on_failure": lambda: retried(conn),
+        "cache_query_hit": lambda: cached(conn, query=QUERY),
+        "cache_query_hit_compact": lambda: compact_cached(conn, query=QUERY),
+        "profile_queries": lambda: profiled(conn, query=QUERY),
+        "stack_with_db_connection_transactional": lambda: stack_transactional(),
+        "stack_with_db_connection_retry": lambda: stack_retry(),
+        "stack_with_db_connection_cache": lambda: stack_cache(query=QUERY),
+        "stack_with_db_connection_cache_profile": lambda: stack_profile(query=QUERY),
+    }
+
+
+def measure_time(fn: Callable[[], object], number: int, repeat: int) -> Tuple[float, float]:
+    timings = timeit.repeat(fn, number=number, repeat=repeat)
+    per_call = [t / number * 1e9 for t in timings]
+    return statistics.median(per_call), min(per_call)
+
+
+def measure_allocations(fn: Callable[[], object], calls: int) -> Tuple[float, float]:
+    """Average peak and retained bytes allocated by a single call."""
+    peaks: List[int] = []
+    tracemalloc.start()
+    try:
+        start, _ = tracemalloc.get_traced_memory()
+        for _ in range(calls):
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            fn()
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - current)
+        end, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return statistics.mean(peaks), (end - start) / calls
+
+
+def run(number: int, repeat: int, alloc_calls: int) -> Dict[str, object]:
+    keeper = setup_database()
+    conn = sqlite3.connect(MEMORY_DB, uri=True, check_same_thread=False)
+    results: Dict[str, Dict[str, float]] = {}
+
+    # Decorators log and print on every call; keep that out of the numbers
+    logging.disable(logging.WARNING)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            scenarios = build_scenarios(conn)
+            for name, fn in scenarios.items():
+                fn()  # warm caches, plans and lazily opened connections
+                median_ns, best_ns = measure_time(fn, number, repeat)
+                peak_bytes, retained_bytes = measure_allocations(fn, alloc_calls)
+                results[name] = {
+                    "median_ns": median_ns,
+                    "best_ns": best_ns,
+                    "peak_alloc_bytes": peak_bytes,
+                    "retained_bytes_per_call": retained_bytes,
+                }
+    finally:
+        logging.disable(logging.NOTSET)
+        conn.close()
+        keeper.close()
+
+    baseline = results["baseline"]["median_ns"]
+    for name, result in results.items():
+        result["overhead_ns"] = result["median_ns"] - baseline
+
+    return {
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "number": number,
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def compare(current: Dict[str, object], previous: Dict[str, object],
+            threshold: float) -> List[str]:
+    """Scenarios whose median time grew by more than threshold times."""
+    regressions = []
+    for name, result in current["results"].items():
+        before = previous.get("results", {}).get(name)
+        if not before or not before["median_ns"]:
+            continue
+        ratio = result["median_ns"] / before["median_ns"]
+        if ratio > threshold:
+            regressions.append(
+                f"{name}: {before['median_ns']:.0f}ns -> {result['median_ns']:.0f}ns ({ratio:.2f}x)"
+            )
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--number", type=int, default=2000, help="calls per timing run")
+    parser.add_argument("--repeat", type=int, default=5, help="timing runs per scenario")
+    parser.add_argument("--alloc-calls", type=int, default=200, help="calls traced for allocations")
+    parser.add_argument("--output", help="write JSON results to this file")
+    parser.add_argument("--compare", help="previous JSON results to check against")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="allowed slowdown ratio before a scenario counts as a regression")
+    args = parser.parse_args(argv)
+
+    report = run(args.number, args.repeat, args.alloc_calls)
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())